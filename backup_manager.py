@@ -1,10 +1,11 @@
 import os
-import shutil
 import json
+import time
 import logging
 from datetime import datetime
 from pathlib import Path
 import asyncio
+from database import SNAPSHOT_TABLES
 
 logger = logging.getLogger('PandaBot.BackupManager')
 
@@ -16,6 +17,16 @@ class BackupManager:
         self.backup_dir = Path('backups')
         self.data_dir = Path('data')
         self.persistent_backup_file = self.data_dir / 'oauth_backup.json'
+        self.delta_file = self.data_dir / 'oauth_backup.delta.jsonl'
+        
+        # Compactação: novo snapshot base após N deltas ou arquivo grande
+        self.compact_every = int(os.getenv('SNAPSHOT_COMPACT_EVERY', '12'))
+        self.compact_bytes = int(os.getenv('SNAPSHOT_COMPACT_BYTES', str(1024 * 1024)))
+        self._deltas_since_base = None
+        
+        # Um snapshot por vez: um delta gravado durante o dump base seria
+        # apagado por _remove_deltas sem estar no arquivo base
+        self._snapshot_lock = asyncio.Lock()
         
         # Criar diretórios
         self.backup_dir.mkdir(exist_ok=True)
@@ -23,84 +34,149 @@ class BackupManager:
         
         logger.info("💾 BackupManager inicializado")
     
-    def create_oauth_snapshot(self):
-        """Criar snapshot JSON dos dados OAuth2 - SEMPRE atualizado"""
+    async def create_oauth_snapshot(self, full=False):
+        """Atualizar o snapshot: delta incremental ou, ao compactar, snapshot base"""
         try:
-            oauth_users = self.db.get_all_oauth_users()
-            tickets = self.db.get_all_tickets()
-            blacklist = self.db.get_all_blacklisted()
-            
-            snapshot = {
-                'timestamp': datetime.utcnow().isoformat(),
-                'version': '1.0',
-                'oauth_users': oauth_users,
-                'tickets': tickets,
-                'blacklist': blacklist,
-                'stats': self.db.get_stats()
-            }
-            
-            # Salvar snapshot
-            with open(self.persistent_backup_file, 'w', encoding='utf-8') as f:
-                json.dump(snapshot, f, indent=2, ensure_ascii=False)
+            async with self._snapshot_lock:
+                if full or self._needs_compaction():
+                    return await self._create_base_snapshot()
+                return await self._append_delta()
+        except Exception as e:
+            logger.error(f"❌ Erro ao criar snapshot: {e}")
+            return False
+    
+    def _needs_compaction(self):
+        if self._deltas_since_base is None or self._deltas_since_base >= self.compact_every:
+            return True
+        if not self.persistent_backup_file.exists():
+            return True
+        return self.delta_file.exists() and self.delta_file.stat().st_size > self.compact_bytes
+    
+    async def _create_base_snapshot(self):
+        """Criar snapshot JSON completo e descartar os deltas anteriores"""
+        try:
+            # Gravação atômica e em streaming; alterações com seq maior que
+            # change_seq ficam para o próximo delta
+            change_seq, counts = await self.db.dump_json(
+                str(self.persistent_backup_file),
+                {'timestamp': datetime.utcnow().isoformat(), 'version': '2.0'}
+            )
+            await asyncio.to_thread(self._remove_deltas)
+            await self.db.ack_snapshot_changes(change_seq)
+            self._deltas_since_base = 0
             
-            logger.info(f"✅ Snapshot OAuth2 criado: {len(oauth_users)} usuários")
+            logger.info(f"✅ Snapshot OAuth2 criado: {counts['oauth_users']} usuários")
             return True
         except Exception as e:
             logger.error(f"❌ Erro ao criar snapshot: {e}")
             return False
     
-    def restore_from_snapshot(self):
+    async def _append_delta(self):
+        """Gravar em JSONL apenas as linhas alteradas desde o último snapshot"""
+        seq, changes = await self.db.get_snapshot_changes()
+        if not changes:
+            return True
+        
+        await asyncio.to_thread(self._write_delta, seq, changes)
+        await self.db.ack_snapshot_changes(seq)
+        self._deltas_since_base += 1
+        
+        logger.info(f"✅ Snapshot incremental: {len(changes)} alterações")
+        return True
+    
+    def _write_delta(self, seq, changes):
+        """Anexar um lote de alterações ao arquivo de deltas"""
+        with open(self.delta_file, 'a', encoding='utf-8') as f:
+            for table, key, row in changes:
+                f.write(json.dumps(
+                    {'seq': seq, 'table': table, 'key': key, 'row': row},
+                    ensure_ascii=False,
+                    separators=(',', ':')
+                ) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _remove_deltas(self):
+        if self.delta_file.exists():
+            self.delta_file.unlink()
+    
+    def _read_snapshot(self):
+        """Ler snapshot base do disco e aplicar os deltas posteriores a ele"""
+        with open(self.persistent_backup_file, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        
+        state = {
+            table: {str(row[key]): row for row in snapshot.get(table, [])}
+            for table, key in SNAPSHOT_TABLES.items()
+        }
+        base_seq = snapshot.get('change_seq', 0)
+        
+        if self.delta_file.exists():
+            with open(self.delta_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        change = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Linha incompleta (falha durante a gravação)
+                        continue
+                    
+                    # Lotes já incluídos no snapshot base
+                    if change['seq'] <= base_seq:
+                        continue
+                    
+                    rows = state[change['table']]
+                    if change['row'] is None:
+                        rows.pop(str(change['key']), None)
+                    else:
+                        rows[str(change['key'])] = change['row']
+        
+        for table in SNAPSHOT_TABLES:
+            snapshot[table] = list(state[table].values())
+        return snapshot
+    
+    async def restore_from_snapshot(self):
         """Restaurar dados do snapshot JSON"""
         if not self.persistent_backup_file.exists():
             logger.warning("⚠️ Nenhum snapshot encontrado para restaurar")
             return False
         
         try:
-            with open(self.persistent_backup_file, 'r', encoding='utf-8') as f:
-                snapshot = json.load(f)
+            started = time.monotonic()
+            snapshot = await asyncio.to_thread(self._read_snapshot)
             
-            # Restaurar OAuth2 users
-            restored_count = 0
-            for user_data in snapshot.get('oauth_users', []):
-                try:
-                    self.db.add_oauth_user(
-                        user_data['user_id'],
-                        user_data['access_token'],
-                        user_data['refresh_token'],
-                        user_data['expires_at']
-                    )
-                    restored_count += 1
-                except Exception as e:
-                    logger.error(f"Erro ao restaurar usuário {user_data.get('user_id')}: {e}")
+            # OAuth2, tickets e blacklist em uma única transação
+            counts = await self.db.restore_rows({table: snapshot.get(table, []) for table in SNAPSHOT_TABLES})
+            if counts is None:
+                return False
             
-            logger.info(f"✅ Snapshot restaurado: {restored_count} usuários OAuth2")
+            elapsed = max(time.monotonic() - started, 1e-6)
+            total = sum(counts.values())
+            logger.info(
+                f"✅ Snapshot restaurado: {counts.get('oauth_users', 0)} usuários OAuth2, "
+                f"{counts.get('tickets', 0)} tickets, {counts.get('blacklist', 0)} na blacklist "
+                f"({total} linhas em {elapsed:.2f}s, {total / elapsed:.0f} linhas/s)"
+            )
             return True
         except Exception as e:
             logger.error(f"❌ Erro ao restaurar snapshot: {e}")
             return False
     
-    def create_full_backup(self):
+    async def create_full_backup(self):
         """Criar backup completo do banco SQLite"""
         timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
         backup_path = self.backup_dir / f'backup_{timestamp}.db'
         
         try:
-            # Forçar commit
-            self.db.conn.commit()
-            
-            # Checkpoint WAL
-            self.db.cursor.execute("PRAGMA wal_checkpoint(FULL)")
-            
-            # Copiar arquivo
-            shutil.copy2(self.db.db_path, backup_path)
+            # Backup online do SQLite (em etapas, fora do event loop)
+            await self.db.copy_database(str(backup_path))
             
             # Também criar snapshot JSON
-            self.create_oauth_snapshot()
+            await self.create_oauth_snapshot()
             
             logger.info(f"💾 Backup completo criado: {backup_path}")
             
             # Limpar backups antigos (manter últimos 10)
-            self._cleanup_old_backups(keep=10)
+            await asyncio.to_thread(self._cleanup_old_backups, keep=10)
             
             return str(backup_path)
         except Exception as e:
@@ -127,17 +203,16 @@ class BackupManager:
         while True:
             try:
                 await asyncio.sleep(interval_minutes * 60)
-                self.create_oauth_snapshot()
+                await self.create_oauth_snapshot()
                 logger.info("🔄 Backup automático executado")
             except Exception as e:
                 logger.error(f"Erro no loop de backup: {e}")
                 await asyncio.sleep(60)  # Esperar 1 minuto em caso de erro
     
-    def verify_integrity(self):
+    async def verify_integrity(self, quick=False):
         """Verificar integridade do banco de dados"""
         try:
-            self.db.cursor.execute("PRAGMA integrity_check")
-            result = self.db.cursor.fetchone()[0]
+            result = await self.db.integrity_check(quick)
             
             if result == "ok":
                 logger.info("✅ Integridade do banco verificada: OK")
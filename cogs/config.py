@@ -15,14 +15,14 @@ class BotConfig(commands.Cog):
     async def config_command(self, interaction: discord.Interaction):
         """Painel de configuração interativo"""
         
-        guild_config = self.bot.db.get_config(str(interaction.guild.id))
+        guild_config = await self.bot.db.get_config(str(interaction.guild.id))
         
         if not guild_config:
             # Criar configuração padrão
-            self.bot.db.set_config(str(interaction.guild.id), 'staff_role', str(Config.STAFF_ROLE_ID))
-            self.bot.db.set_config(str(interaction.guild.id), 'log_channel', str(Config.LOG_CHANNEL_ID))
-            self.bot.db.set_config(str(interaction.guild.id), 'auto_pull', 1)
-            guild_config = self.bot.db.get_config(str(interaction.guild.id))
+            await self.bot.db.set_config(str(interaction.guild.id), 'staff_role', str(Config.STAFF_ROLE_ID))
+            await self.bot.db.set_config(str(interaction.guild.id), 'log_channel', str(Config.LOG_CHANNEL_ID))
+            await self.bot.db.set_config(str(interaction.guild.id), 'auto_pull', 1)
+            guild_config = await self.bot.db.get_config(str(interaction.guild.id))
         
         embed = self.create_config_embed(interaction.guild, guild_config)
         view = ConfigView(self.bot)
@@ -96,7 +96,7 @@ class ConfigView(discord.ui.View):
     
     async def update_embed(self, interaction: discord.Interaction):
         """Atualizar embed principal"""
-        config = self.bot.db.get_config(str(interaction.guild.id))
+        config = await self.bot.db.get_config(str(interaction.guild.id))
         cog = self.bot.get_cog('BotConfig')
         new_embed = cog.create_config_embed(interaction.guild, config)
         
@@ -134,11 +134,11 @@ class ConfigView(discord.ui.View):
     
     @discord.ui.button(label="Auto-Puxar", style=discord.ButtonStyle.success, emoji="🔄", row=1, custom_id="config:auto_pull")
     async def auto_pull(self, interaction: discord.Interaction, button: discord.ui.Button):
-        config = self.bot.db.get_config(str(interaction.guild.id))
+        config = await self.bot.db.get_config(str(interaction.guild.id))
         current = config.get('auto_pull', 0)
         new_value = 0 if current else 1
         
-        self.bot.db.set_config(str(interaction.guild.id), 'auto_pull', new_value)
+        await self.bot.db.set_config(str(interaction.guild.id), 'auto_pull', new_value)
         
         embed = EmbedBuilder.success(
             "Auto-Puxar Atualizado",
@@ -180,7 +180,7 @@ class RoleConfigModal(discord.ui.Modal):
             if not role:
                 return await interaction.response.send_message("❌ Cargo não encontrado!", ephemeral=True)
             
-            self.bot.db.set_config(str(interaction.guild.id), self.config_key, str(role.id))
+            await self.bot.db.set_config(str(interaction.guild.id), self.config_key, str(role.id))
             
             embed = EmbedBuilder.success(
                 "Cargo Configurado",
@@ -218,7 +218,7 @@ class ChannelConfigModal(discord.ui.Modal):
             if not channel:
                 return await interaction.response.send_message("❌ Canal não encontrado!", ephemeral=True)
             
-            self.bot.db.set_config(str(interaction.guild.id), self.config_key, str(channel.id))
+            await self.bot.db.set_config(str(interaction.guild.id), self.config_key, str(channel.id))
             
             embed = EmbedBuilder.success(
                 "Canal Configurado",
@@ -249,7 +249,7 @@ class WelcomeMessageModal(discord.ui.Modal, title="Configurar Mensagem de Boas-V
         self.bot = bot
     
     async def on_submit(self, interaction: discord.Interaction):
-        self.bot.db.set_config(str(interaction.guild.id), 'welcome_message', self.message.value)
+        await self.bot.db.set_config(str(interaction.guild.id), 'welcome_message', self.message.value)
         
         preview = self.message.value.replace('{user}', interaction.user.mention).replace('{server}', interaction.guild.name)
         
@@ -2,6 +2,7 @@ import discord
 from discord.ext import commands
 import logging
 from utils import EmbedBuilder, Config
+from metrics import PULL_RESULTS
 
 logger = logging.getLogger('PandaBot.Events')
 
@@ -13,7 +14,7 @@ class Events(commands.Cog):
     async def on_member_join(self, member: discord.Member):
         """Evento quando membro entra no servidor"""
         
-        config = self.bot.db.get_config(str(member.guild.id))
+        config = await self.bot.db.get_config(str(member.guild.id))
         
         if config and config.get('welcome_channel'):
             welcome_channel = member.guild.get_channel(int(config['welcome_channel']))
@@ -81,7 +82,7 @@ class Events(commands.Cog):
     async def on_member_remove(self, member: discord.Member):
         """Evento quando membro sai do servidor"""
         
-        config = self.bot.db.get_config(str(member.guild.id))
+        config = await self.bot.db.get_config(str(member.guild.id))
         
         # Mensagem de despedida
         if config and config.get('goodbye_channel'):
@@ -135,7 +136,7 @@ class Events(commands.Cog):
                 pass
         
         # Verificar se tem OAuth2 e auto-puxar está ativo
-        oauth_data = self.bot.db.get_oauth_user(str(member.id))
+        oauth_data = await self.bot.db.get_oauth_user(str(member.id))
         
         if oauth_data and config and config.get('auto_pull'):
             logger.info(f"🔄 {member.name} tem OAuth2 - tentando puxar de volta...")
@@ -148,7 +149,6 @@ class Events(commands.Cog):
                     access_token = oauth_data['access_token']
                     
                     # Tentar adicionar de volta
-                    import aiohttp
                     headers = {
                         'Authorization': f'Bot {self.bot.http.token}',
                         'Content-Type': 'application/json'
@@ -156,41 +156,42 @@ class Events(commands.Cog):
                     
                     data = {'access_token': access_token}
                     
-                    async with aiohttp.ClientSession() as session:
-                        async with session.put(
-                            f'https://discord.com/api/v10/guilds/{member.guild.id}/members/{member.id}',
-                            headers=headers,
-                            json=data
-                        ) as resp:
-                            if resp.status in [200, 201, 204]:
-                                logger.info(f"✅ {member.name} foi puxado de volta com sucesso!")
-                                
-                                # Notificar em logs
-                                if log_channel:
-                                    pull_embed = EmbedBuilder.success(
-                                        "🔄 Membro Puxado de Volta",
-                                        f"**{member.name}** foi automaticamente adicionado de volta ao servidor via OAuth2!",
-                                        thumbnail=member.display_avatar.url,
-                                        footer_icon=member.guild.icon.url if member.guild.icon else None
-                                    )
-                                    await log_channel.send(embed=pull_embed)
-                                
-                                # Atualizar banco
-                                self.bot.db.update_last_pulled(str(member.id))
-                                self.bot.db.increment_stat('successful_pulls')
-                            else:
-                                logger.warning(f"⚠️ Falha ao puxar {member.name}: Status {resp.status}")
-                                self.bot.db.increment_stat('failed_pulls')
+                    async with self.bot.http_session.put(
+                        f'https://discord.com/api/v10/guilds/{member.guild.id}/members/{member.id}',
+                        headers=headers,
+                        json=data
+                    ) as resp:
+                        if resp.status in [200, 201, 204]:
+                            PULL_RESULTS.inc(source='auto_pull', result='pulled')
+                            logger.info(f"✅ {member.name} foi puxado de volta com sucesso!")
+                            
+                            # Notificar em logs
+                            if log_channel:
+                                pull_embed = EmbedBuilder.success(
+                                    "🔄 Membro Puxado de Volta",
+                                    f"**{member.name}** foi automaticamente adicionado de volta ao servidor via OAuth2!",
+                                    thumbnail=member.display_avatar.url,
+                                    footer_icon=member.guild.icon.url if member.guild.icon else None
+                                )
+                                await log_channel.send(embed=pull_embed)
+                            
+                            # Atualizar banco
+                            await self.bot.db.update_last_pulled(str(member.id))
+                            await self.bot.db.increment_stat('successful_pulls')
+                        else:
+                            PULL_RESULTS.inc(source='auto_pull', result='failed')
+                            logger.warning(f"⚠️ Falha ao puxar {member.name}: Status {resp.status}")
+                            await self.bot.db.increment_stat('failed_pulls')
             
             except Exception as e:
                 logger.error(f"Erro ao tentar puxar {member.name}: {e}")
-                self.bot.db.increment_stat('failed_pulls')
+                await self.bot.db.increment_stat('failed_pulls')
     
     @commands.Cog.listener()
     async def on_member_ban(self, guild: discord.Guild, user: discord.User):
         """Evento quando membro é banido"""
         
-        config = self.bot.db.get_config(str(guild.id))
+        config = await self.bot.db.get_config(str(guild.id))
         log_channel_id = int(config.get('log_channel', Config.LOG_CHANNEL_ID)) if config else Config.LOG_CHANNEL_ID
         log_channel = self.bot.get_channel(log_channel_id)
         if not log_channel:
@@ -223,7 +224,7 @@ class Events(commands.Cog):
     async def on_member_unban(self, guild: discord.Guild, user: discord.User):
         """Evento quando membro é desbanido"""
         
-        config = self.bot.db.get_config(str(guild.id))
+        config = await self.bot.db.get_config(str(guild.id))
         log_channel_id = int(config.get('log_channel', Config.LOG_CHANNEL_ID)) if config else Config.LOG_CHANNEL_ID
         log_channel = self.bot.get_channel(log_channel_id)
         if not log_channel:
@@ -248,7 +249,7 @@ class Events(commands.Cog):
     async def on_guild_channel_create(self, channel: discord.abc.GuildChannel):
         """Evento quando canal é criado"""
         
-        config = self.bot.db.get_config(str(channel.guild.id))
+        config = await self.bot.db.get_config(str(channel.guild.id))
         log_channel_id = int(config.get('log_channel', Config.LOG_CHANNEL_ID)) if config else Config.LOG_CHANNEL_ID
         log_channel = self.bot.get_channel(log_channel_id)
         if not log_channel or channel.id == log_channel.id:
@@ -273,7 +274,7 @@ class Events(commands.Cog):
     async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
         """Evento quando canal é deletado"""
         
-        config = self.bot.db.get_config(str(channel.guild.id))
+        config = await self.bot.db.get_config(str(channel.guild.id))
         log_channel_id = int(config.get('log_channel', Config.LOG_CHANNEL_ID)) if config else Config.LOG_CHANNEL_ID
         log_channel = self.bot.get_channel(log_channel_id)
         if not log_channel:
@@ -298,7 +299,7 @@ class Events(commands.Cog):
     async def on_guild_role_create(self, role: discord.Role):
         """Evento quando cargo é criado"""
         
-        config = self.bot.db.get_config(str(role.guild.id))
+        config = await self.bot.db.get_config(str(role.guild.id))
         log_channel_id = int(config.get('log_channel', Config.LOG_CHANNEL_ID)) if config else Config.LOG_CHANNEL_ID
         log_channel = self.bot.get_channel(log_channel_id)
         if not log_channel:
@@ -323,7 +324,7 @@ class Events(commands.Cog):
     async def on_guild_role_delete(self, role: discord.Role):
         """Evento quando cargo é deletado"""
         
-        config = self.bot.db.get_config(str(role.guild.id))
+        config = await self.bot.db.get_config(str(role.guild.id))
         log_channel_id = int(config.get('log_channel', Config.LOG_CHANNEL_ID)) if config else Config.LOG_CHANNEL_ID
         log_channel = self.bot.get_channel(log_channel_id)
         if not log_channel:
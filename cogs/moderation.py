@@ -63,7 +63,7 @@ class Moderation(commands.Cog):
                 )
                 await log_channel.send(embed=log_embed)
             
-            self.bot.db.add_log('moderation', str(member.id), str(interaction.guild.id), 'kick', reason)
+            await self.bot.db.add_log('moderation', str(member.id), str(interaction.guild.id), 'kick', reason)
             
         except Exception as e:
             logger.error(f"Erro ao expulsar {member}: {e}")
@@ -120,7 +120,7 @@ class Moderation(commands.Cog):
                 )
                 await log_channel.send(embed=log_embed)
             
-            self.bot.db.add_log('moderation', str(member.id), str(interaction.guild.id), 'ban', reason)
+            await self.bot.db.add_log('moderation', str(member.id), str(interaction.guild.id), 'ban', reason)
             
         except Exception as e:
             logger.error(f"Erro ao banir {member}: {e}")
@@ -158,7 +158,7 @@ class Moderation(commands.Cog):
                 )
                 await log_channel.send(embed=log_embed)
             
-            self.bot.db.add_log('moderation', str(user.id), str(interaction.guild.id), 'unban', f"Por {interaction.user.name}")
+            await self.bot.db.add_log('moderation', str(user.id), str(interaction.guild.id), 'unban', f"Por {interaction.user.name}")
             
         except discord.NotFound:
             embed = EmbedBuilder.error("Erro", "Usuário não encontrado ou não está banido.", footer_icon=interaction.guild.icon.url if interaction.guild.icon else None)
@@ -225,7 +225,7 @@ class Moderation(commands.Cog):
                 )
                 await log_channel.send(embed=log_embed)
             
-            self.bot.db.add_log('moderation', str(member.id), str(interaction.guild.id), 'mute', f"{duration} - {reason}")
+            await self.bot.db.add_log('moderation', str(member.id), str(interaction.guild.id), 'mute', f"{duration} - {reason}")
             
         except Exception as e:
             logger.error(f"Erro ao mutar: {e}")
@@ -262,7 +262,7 @@ class Moderation(commands.Cog):
                 )
                 await log_channel.send(embed=log_embed)
             
-            self.bot.db.add_log('moderation', str(member.id), str(interaction.guild.id), 'unmute', f"Por {interaction.user.name}")
+            await self.bot.db.add_log('moderation', str(member.id), str(interaction.guild.id), 'unmute', f"Por {interaction.user.name}")
             
         except Exception as e:
             logger.error(f"Erro ao desmutar: {e}")
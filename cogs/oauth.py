@@ -1,11 +1,11 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import aiohttp
 import os
 from datetime import datetime, timedelta
 import logging
 from utils import EmbedBuilder, Config, Permissions
+from pull_engine import PullEngine
 
 logger = logging.getLogger('PandaBot.OAuth')
 
@@ -16,6 +16,7 @@ class OAuth(commands.Cog):
         self.client_secret = os.getenv('CLIENT_SECRET')
         self.redirect_uri = os.getenv('REDIRECT_URI')
         self.api_endpoint = 'https://discord.com/api/v10'
+        self.pull_engine = PullEngine(bot)
     
     def generate_auth_url(self, user_id=None):
         """Gerar URL de autorização OAuth2"""
@@ -39,10 +40,8 @@ class OAuth(commands.Cog):
         """Comando principal de OAuth2"""
         
         # Verificar blacklist
-        if self.bot.db.is_blacklisted(str(interaction.user.id)):
-            blacklist_data = self.bot.db.get_all_blacklisted()
-            user_blacklist = next((b for b in blacklist_data if b['user_id'] == str(interaction.user.id)), None)
-            
+        user_blacklist = await self.bot.db.get_blacklist_entry(str(interaction.user.id))
+        if user_blacklist:
             embed = EmbedBuilder.error(
                 "Acesso Negado",
                 "Você está na blacklist e não pode usar este sistema.",
@@ -52,7 +51,7 @@ class OAuth(commands.Cog):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
         
         # Verificar se usuário já tem OAuth2
-        user_data = self.bot.db.get_oauth_user(str(interaction.user.id))
+        user_data = await self.bot.db.get_oauth_user(str(interaction.user.id))
         
         if user_data:
             # Usuário já autorizado
@@ -119,7 +118,7 @@ class OAuth(commands.Cog):
         await interaction.response.defer(ephemeral=True)
         
         # Obter todos os usuários OAuth2
-        oauth_users = self.bot.db.get_all_oauth_users()
+        oauth_users = await self.bot.db.get_all_oauth_users()
         
         if not oauth_users:
             embed = EmbedBuilder.warning(
@@ -223,9 +222,9 @@ class OAuth(commands.Cog):
         
         # Obter lista de usuários OAuth
         if user_id:
-            oauth_users = [self.bot.db.get_oauth_user(user_id)]
+            oauth_users = [await self.bot.db.get_oauth_user(user_id)]
         else:
-            oauth_users = self.bot.db.get_all_oauth_users()
+            oauth_users = await self.bot.db.get_all_oauth_users()
 
         if not oauth_users or all(u is None for u in oauth_users):
             embed = EmbedBuilder.error(
@@ -235,65 +234,44 @@ class OAuth(commands.Cog):
             )
             return await interaction.followup.send(embed=embed, ephemeral=True)
         
-        total_puxados = 0
-        total_falhados = 0
+        oauth_users = [u for u in oauth_users if u]
+        footer_icon = interaction.guild.icon.url if interaction.guild.icon else None
         
-        for user_data in oauth_users:
-            if not user_data:
-                continue
-            
-            uid = user_data['user_id']
-            try:
-                user = await self.bot.fetch_user(int(uid))
-                
-                # Verificar se já está no servidor
-                member = interaction.guild.get_member(int(uid))
-                if member:
-                    logger.info(f"⏭️ {user.name} já está no servidor, pulando...")
-                    continue
-                
-                # ✅ VERIFICAR E RENOVAR TOKEN SE EXPIRADO
-                access_token = await self.ensure_valid_token(uid, user_data)
-                
-                if not access_token:
-                    logger.error(f"❌ Token inválido para {user.name}, não foi possível renovar")
-                    total_falhados += 1
-                    continue
-                
-                # Tentar puxar com token válido
-                headers = {
-                    'Authorization': f'Bot {self.bot.http.token}',
-                    'Content-Type': 'application/json'
-                }
-                
-                data = {'access_token': access_token}
-                
-                async with aiohttp.ClientSession() as session:
-                    async with session.put(
-                        f'{self.api_endpoint}/guilds/{interaction.guild.id}/members/{uid}',
-                        headers=headers,
-                        json=data
-                    ) as resp:
-                        if resp.status in [200, 201, 204]:
-                            self.bot.db.update_last_pulled(uid)
-                            self.bot.db.increment_stat('successful_pulls')
-                            total_puxados += 1
-                            logger.info(f"✅ {user.name} puxado com sucesso!")
-                        else:
-                            error_text = await resp.text()
-                            logger.error(f"❌ Erro ao puxar {user.name}: {resp.status} - {error_text}")
-                            total_falhados += 1
-            
-            except Exception as e:
-                total_falhados += 1
-                logger.error(f"Erro ao puxar usuário {uid}: {e}")
+        progress_message = await interaction.followup.send(
+            embed=self._pull_progress_embed(None, len(oauth_users), footer_icon),
+            ephemeral=True,
+            wait=True
+        )
+        
+        async def report_progress(result):
+            await progress_message.edit(embed=self._pull_progress_embed(result, result.total, footer_icon))
+        
+        result = await self.pull_engine.pull(interaction.guild, oauth_users, progress_callback=report_progress)
         
         embed = EmbedBuilder.success(
             "Puxar Usuários",
-            f"✅ **{total_puxados}** usuário(s) puxado(s) com sucesso.\n❌ **{total_falhados}** falharam.",
-            footer_icon=interaction.guild.icon.url if interaction.guild.icon else None
+            f"✅ **{result.pulled}** usuário(s) puxado(s) com sucesso.\n"
+            f"⏭️ **{result.already_member}** já estavam no servidor.\n"
+            f"❌ **{result.failed}** falharam.\n"
+            f"⏱️ Concluído em **{result.elapsed:.1f}s**",
+            footer_icon=footer_icon
         )
-        await interaction.followup.send(embed=embed, ephemeral=True)
+        try:
+            await progress_message.edit(embed=embed)
+        except discord.HTTPException:
+            # Token da interação expirado (pull muito longo)
+            logger.warning("⚠️ Não foi possível atualizar a mensagem final do pull")
+    
+    def _pull_progress_embed(self, result, total, footer_icon):
+        """Embed de progresso do pull em massa"""
+        if result is None:
+            description = f"🔄 Preparando pull de **{total}** usuário(s)..."
+        else:
+            description = (
+                f"🔄 **{result.done}/{total}** processados\n"
+                f"✅ {result.pulled} puxados • ⏭️ {result.already_member} já no servidor • ❌ {result.failed} falhas"
+            )
+        return EmbedBuilder.info("Puxando Usuários", description, footer_icon=footer_icon)
     
     async def ensure_valid_token(self, user_id, user_data):
         """
@@ -321,7 +299,7 @@ class OAuth(commands.Cog):
     
     async def refresh_token(self, user_id):
         """Renovar access token - Retorna o novo access_token ou None"""
-        user_data = self.bot.db.get_oauth_user(user_id)
+        user_data = await self.bot.db.get_oauth_user(user_id)
         
         if not user_data or not user_data.get('refresh_token'):
             logger.error(f"Sem refresh token para {user_id}")
@@ -335,27 +313,27 @@ class OAuth(commands.Cog):
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f'{self.api_endpoint}/oauth2/token',
-                    data=data,
-                    headers={'Content-Type': 'application/x-www-form-urlencoded'}
-                ) as resp:
-                    if resp.status == 200:
-                        token_data = await resp.json()
-                        
-                        access_token = token_data['access_token']
-                        refresh_token = token_data['refresh_token']
-                        expires_in = token_data['expires_in']
-                        expires_at = int((datetime.utcnow() + timedelta(seconds=expires_in)).timestamp())
-                        
-                        self.bot.db.add_oauth_user(user_id, access_token, refresh_token, expires_at)
-                        logger.info(f"✅ Token renovado para {user_id}")
-                        return access_token
-                    else:
-                        error_text = await resp.text()
-                        logger.error(f"❌ Erro ao renovar token para {user_id}: {resp.status} - {error_text}")
-                        return None
+            async with self.bot.http_session.post(
+                f'{self.api_endpoint}/oauth2/token',
+                data=data,
+                headers={'Content-Type': 'application/x-www-form-urlencoded'}
+            ) as resp:
+                if resp.status == 200:
+                    token_data = await resp.json()
+                    
+                    access_token = token_data['access_token']
+                    refresh_token = token_data['refresh_token']
+                    expires_in = token_data['expires_in']
+                    expires_at = int((datetime.utcnow() + timedelta(seconds=expires_in)).timestamp())
+                    
+                    await self.bot.db.add_oauth_user(user_id, access_token, refresh_token, expires_at)
+                    self.bot.token_refresher.schedule(user_id, expires_at)
+                    logger.info(f"✅ Token renovado para {user_id}")
+                    return access_token
+                else:
+                    error_text = await resp.text()
+                    logger.error(f"❌ Erro ao renovar token para {user_id}: {resp.status} - {error_text}")
+                    return None
         except Exception as e:
             logger.error(f"❌ Exceção ao renovar token para {user_id}: {e}")
             return None
@@ -377,7 +355,7 @@ class OAuthActiveView(discord.ui.View):
     
     @discord.ui.button(label="Ver Detalhes", style=discord.ButtonStyle.primary, emoji="📊")
     async def details_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user_data = self.oauth_cog.bot.db.get_oauth_user(str(interaction.user.id))
+        user_data = await self.oauth_cog.bot.db.get_oauth_user(str(interaction.user.id))
         
         embed = EmbedBuilder.info(
             "Detalhes do OAuth2",
@@ -417,7 +395,8 @@ class ConfirmRevokeView(discord.ui.View):
     
     @discord.ui.button(label="Sim, Revogar", style=discord.ButtonStyle.danger, emoji="✅")
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-        self.oauth_cog.bot.db.remove_oauth_user(str(interaction.user.id))
+        await self.oauth_cog.bot.db.remove_oauth_user(str(interaction.user.id))
+        self.oauth_cog.bot.token_refresher.unschedule(str(interaction.user.id))
         
         embed = EmbedBuilder.success(
             "Autorização Revogada",
@@ -153,7 +153,7 @@ class Payments(commands.Cog):
                 await log_channel.send(embed=log_embed)
             
             # Salvar no banco de dados (opcional)
-            self.bot.db.add_log(
+            await self.bot.db.add_log(
                 'payment', 
                 str(interaction.user.id), 
                 str(interaction.guild.id),
@@ -343,7 +343,7 @@ class Payments(commands.Cog):
                 await log_channel.send(embed=log_embed)
             
             # Salvar no banco de dados
-            self.bot.db.add_log(
+            await self.bot.db.add_log(
                 'payment',
                 user_id,
                 guild_id,
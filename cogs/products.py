@@ -16,28 +16,6 @@ class Products(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.cart_category_id = 1160644873272172627
-        self._create_products_table()
-    
-    def _create_products_table(self):
-        """Criar tabela de produtos no banco de dados"""
-        try:
-            self.bot.db.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS products (
-                    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT UNIQUE NOT NULL,
-                    eur_cents INTEGER NOT NULL,
-                    brl_cents INTEGER NOT NULL,
-                    description TEXT NOT NULL,
-                    image_url TEXT NOT NULL,
-                    created_at INTEGER NOT NULL,
-                    created_by TEXT NOT NULL,
-                    updated_at INTEGER DEFAULT NULL
-                )
-            """)
-            self.bot.db.conn.commit()
-            logger.info("✅ Tabela de produtos verificada/criada")
-        except Exception as e:
-            logger.error(f"Erro ao criar tabela de produtos: {e}")
     
     @app_commands.command(name="criarproduto", description="Criar produto para venda")
     @app_commands.describe(
@@ -92,7 +70,7 @@ class Products(commands.Cog):
                 return await interaction.response.send_message(embed=embed, ephemeral=True)
             
             # Verificar se produto já existe
-            existing = self._get_product_by_name(nome)
+            existing = await self.bot.db.get_product_by_name(nome)
             if existing:
                 embed = EmbedBuilder.error(
                     "Produto Já Existe",
@@ -150,7 +128,7 @@ class Products(commands.Cog):
             await canal.send(embed=embed, view=view)
             
             # Salvar produto no banco de dados
-            self._save_product(
+            await self.bot.db.add_product(
                 nome,
                 eur_cents,
                 brl_cents,
@@ -219,11 +197,11 @@ class Products(commands.Cog):
         """Enviar produto existente"""
         
         # Buscar produto
-        product = self._get_product_by_name(nome)
+        product = await self.bot.db.get_product_by_name(nome)
         
         if not product:
             # Listar produtos disponíveis
-            all_products = self._get_all_products()
+            all_products = await self.bot.db.get_all_products()
             
             if not all_products:
                 embed = EmbedBuilder.error(
@@ -319,10 +297,10 @@ class Products(commands.Cog):
         """Painel de edição de produto"""
         
         # Buscar produto
-        product = self._get_product_by_name(nome)
+        product = await self.bot.db.get_product_by_name(nome)
         
         if not product:
-            all_products = self._get_all_products()
+            all_products = await self.bot.db.get_all_products()
             
             if not all_products:
                 embed = EmbedBuilder.error(
@@ -378,76 +356,6 @@ class Products(commands.Cog):
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 
-    def _save_product(self, name, eur_cents, brl_cents, description, image_url, created_by):
-        """Salvar produto no banco"""
-        try:
-            self.bot.db.cursor.execute("""
-                INSERT INTO products (name, eur_cents, brl_cents, description, image_url, created_at, created_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (name, eur_cents, brl_cents, description, image_url, int(datetime.utcnow().timestamp()), created_by))
-            self.bot.db.conn.commit()
-            logger.info(f"✅ Produto '{name}' salvo no banco")
-        except Exception as e:
-            logger.error(f"Erro ao salvar produto: {e}")
-            self.bot.db.conn.rollback()
-    
-    def _get_product_by_name(self, name):
-        """Buscar produto por nome"""
-        try:
-            self.bot.db.cursor.execute("SELECT * FROM products WHERE name = ?", (name,))
-            row = self.bot.db.cursor.fetchone()
-            return dict(row) if row else None
-        except Exception as e:
-            logger.error(f"Erro ao buscar produto: {e}")
-            return None
-    
-    def _get_all_products(self):
-        """Buscar todos os produtos"""
-        try:
-            self.bot.db.cursor.execute("SELECT * FROM products ORDER BY name")
-            return [dict(row) for row in self.bot.db.cursor.fetchall()]
-        except Exception as e:
-            logger.error(f"Erro ao buscar produtos: {e}")
-            return []
-    
-    def _update_product(self, product_id, **kwargs):
-        """Atualizar produto"""
-        try:
-            fields = []
-            values = []
-            
-            for key, value in kwargs.items():
-                fields.append(f"{key} = ?")
-                values.append(value)
-            
-            fields.append("updated_at = ?")
-            values.append(int(datetime.utcnow().timestamp()))
-            
-            values.append(product_id)
-            
-            query = f"UPDATE products SET {', '.join(fields)} WHERE product_id = ?"
-            self.bot.db.cursor.execute(query, values)
-            self.bot.db.conn.commit()
-            logger.info(f"✅ Produto ID {product_id} atualizado")
-            return True
-        except Exception as e:
-            logger.error(f"Erro ao atualizar produto: {e}")
-            self.bot.db.conn.rollback()
-            return False
-    
-    def _delete_product(self, product_id):
-        """Deletar produto"""
-        try:
-            self.bot.db.cursor.execute("DELETE FROM products WHERE product_id = ?", (product_id,))
-            self.bot.db.conn.commit()
-            logger.info(f"✅ Produto ID {product_id} deletado")
-            return True
-        except Exception as e:
-            logger.error(f"Erro ao deletar produto: {e}")
-            self.bot.db.conn.rollback()
-            return False
-
-
 class ProductEditView(discord.ui.View):
     """View para editar ou apagar produto"""
     
@@ -519,10 +427,9 @@ class EditPriceModal(discord.ui.Modal):
             price_cents = int(price_float * 100)
             
             # Atualizar no banco
-            products_cog = self.bot.get_cog('Products')
             key = 'eur_cents' if self.currency == 'eur' else 'brl_cents'
             
-            success = products_cog._update_product(
+            success = await self.bot.db.update_product(
                 self.product['product_id'],
                 **{key: price_cents}
             )
@@ -579,9 +486,7 @@ class EditDescriptionModal(discord.ui.Modal, title="Editar Descrição"):
         self.description.default = product['description']
     
     async def on_submit(self, interaction: discord.Interaction):
-        products_cog = self.bot.get_cog('Products')
-        
-        success = products_cog._update_product(
+        success = await self.bot.db.update_product(
             self.product['product_id'],
             description=self.description.value
         )
@@ -639,9 +544,7 @@ class EditImageModal(discord.ui.Modal, title="Editar Imagem"):
             )
             return await interaction.response.send_message(embed=embed, ephemeral=True)
         
-        products_cog = self.bot.get_cog('Products')
-        
-        success = products_cog._update_product(
+        success = await self.bot.db.update_product(
             self.product['product_id'],
             image_url=self.image_url.value
         )
@@ -684,9 +587,7 @@ class ConfirmDeleteView(discord.ui.View):
     
     @discord.ui.button(label="Sim, Apagar", style=discord.ButtonStyle.danger, emoji="✅")
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-        products_cog = self.bot.get_cog('Products')
-        
-        success = products_cog._delete_product(self.product['product_id'])
+        success = await self.bot.db.delete_product(self.product['product_id'])
         
         if success:
             embed = EmbedBuilder.success(
@@ -749,7 +650,7 @@ class ProductView(discord.ui.View):
         """Botão de compra"""
         
         # Verificar blacklist
-        if self.bot.db.is_blacklisted(str(interaction.user.id)):
+        if await self.bot.db.is_blacklisted(str(interaction.user.id)):
             embed = EmbedBuilder.error(
                 "Acesso Negado",
                 "Você está na blacklist e não pode realizar compras.",
@@ -857,7 +758,7 @@ class QuantityModal(discord.ui.Modal, title="Finalizar Compra"):
             # Criar canal
             channel_name = f"🛒-compra-{interaction.user.name}"
             
-            config = self.bot.db.get_config(str(interaction.guild.id))
+            config = await self.bot.db.get_config(str(interaction.guild.id))
             staff_role_id = int(config.get('staff_role', Config.STAFF_ROLE_ID)) if config else Config.STAFF_ROLE_ID
             
             overwrites = {
@@ -875,8 +776,13 @@ class QuantityModal(discord.ui.Modal, title="Finalizar Compra"):
                 overwrites=overwrites
             )
             
+            # Log da transcrição antes de o canal contar como ticket aberto
+            tickets_cog = self.bot.get_cog('Tickets')
+            if tickets_cog:
+                await tickets_cog.recorder.start(cart_channel)
+            
             # Criar ticket no banco
-            self.bot.db.create_ticket(str(cart_channel.id), str(interaction.user.id), "compra")
+            await self.bot.db.create_ticket(str(cart_channel.id), str(interaction.user.id), "compra")
             
             # Criar sessão de pagamento Stripe
             base_url = os.getenv('REDIRECT_URI', 'https://seu-dominio.railway.app').split('/oauth')[0]
@@ -1016,7 +922,7 @@ class QuantityModal(discord.ui.Modal, title="Finalizar Compra"):
                 await log_channel.send(embed=log_embed)
             
             # Salvar no banco
-            self.bot.db.add_log(
+            await self.bot.db.add_log(
                 'payment',
                 str(interaction.user.id),
                 str(interaction.guild.id),
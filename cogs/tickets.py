@@ -2,8 +2,9 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import logging
+import io
 from datetime import datetime
-from utils import EmbedBuilder, Config, TranscriptGenerator, Permissions
+from utils import EmbedBuilder, Config, TranscriptRecorder, Permissions
 
 logger = logging.getLogger('PandaBot.Tickets')
 
@@ -13,11 +14,80 @@ class Tickets(commands.Cog):
         self.ticket_category_id = Config.TICKET_CATEGORY_ID
         self.cart_category_id = Config.CART_CATEGORY_ID
         self.ticket_panel_channel_id = Config.TICKET_PANEL_CHANNEL_ID
+        self.recorder = TranscriptRecorder()
+        self.panel_ready = False
     
     @commands.Cog.listener()
     async def on_ready(self):
-        """Enviar painel de tickets ao iniciar"""
-        await self.setup_ticket_panel()
+        """Enviar painel de tickets ao iniciar e completar transcrições após reconectar"""
+        # on_ready se repete a cada reconexão: o painel só é recriado uma vez
+        if not self.panel_ready:
+            self.panel_ready = True
+            await self.setup_ticket_panel()
+        await self.catch_up_transcripts()
+    
+    @commands.Cog.listener()
+    async def on_disconnect(self):
+        """Mensagens podem se perder até a reconexão"""
+        self.recorder.pause()
+    
+    @commands.Cog.listener()
+    async def on_resumed(self):
+        """Buscar o que faltou enquanto o gateway esteve desconectado"""
+        await self.catch_up_transcripts()
+    
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        """Capturar mensagens de tickets abertos para a transcrição"""
+        if not message.guild or not await self.bot.db.is_open_ticket(str(message.channel.id)):
+            return
+        
+        try:
+            await self.recorder.add(message)
+        except Exception as e:
+            logger.error(f"Erro ao capturar mensagem do ticket {message.channel.id}: {e}")
+    
+    @commands.Cog.listener()
+    async def on_message_edit(self, before: discord.Message, after: discord.Message):
+        """Capturar edições em tickets abertos"""
+        if before.content == after.content or not after.guild:
+            return
+        if not await self.bot.db.is_open_ticket(str(after.channel.id)):
+            return
+        
+        try:
+            await self.recorder.edit(after)
+        except Exception as e:
+            logger.error(f"Erro ao capturar edição do ticket {after.channel.id}: {e}")
+    
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
+        """Descartar o log de tickets apagados sem passar pelo fechamento"""
+        try:
+            await self.recorder.discard(channel.id)
+        except Exception as e:
+            logger.error(f"Erro ao descartar transcrição do canal {channel.id}: {e}")
+    
+    async def catch_up_transcripts(self):
+        """Completar os logs dos tickets abertos com mensagens perdidas enquanto offline"""
+        open_channels = await self.bot.db.get_open_ticket_channels()
+        
+        # Logs de tickets fechados ou apagados enquanto o bot estava offline
+        removed = await self.recorder.prune(open_channels)
+        if removed:
+            logger.info(f"🗑️ {removed} logs de transcrição órfãos removidos")
+        
+        for channel_id in open_channels:
+            channel = self.bot.get_channel(int(channel_id))
+            if not channel:
+                continue
+            
+            try:
+                count = await self.recorder.catch_up(channel)
+                if count:
+                    logger.info(f"📝 {count} mensagens recuperadas para a transcrição de {channel.name}")
+            except Exception as e:
+                logger.error(f"Erro ao recuperar histórico do ticket {channel_id}: {e}")
     
     async def setup_ticket_panel(self):
         """Configurar painel de tickets no canal específico"""
@@ -73,7 +143,7 @@ class Tickets(commands.Cog):
         """Criar ticket ou compra"""
         
         # Verificar se já tem ticket aberto
-        existing_tickets = self.bot.db.get_user_tickets(str(interaction.user.id))
+        existing_tickets = await self.bot.db.get_user_tickets(str(interaction.user.id))
         open_tickets = [t for t in existing_tickets if t['status'] == 'open']
         
         if open_tickets:
@@ -99,7 +169,7 @@ class Tickets(commands.Cog):
         # Criar canal
         channel_name = f"{'🎫-ticket' if ticket_type == 'ticket' else '🛒-compra'}-{interaction.user.name}"
         
-        config = self.bot.db.get_config(str(interaction.guild.id))
+        config = await self.bot.db.get_config(str(interaction.guild.id))
         staff_role_id = int(config.get('staff_role', Config.STAFF_ROLE_ID)) if config else Config.STAFF_ROLE_ID
         
         overwrites = {
@@ -119,8 +189,11 @@ class Tickets(commands.Cog):
                 overwrites=overwrites
             )
             
+            # Log da transcrição antes de o canal contar como ticket aberto
+            await self.recorder.start(channel)
+            
             # Salvar no banco
-            ticket_id = self.bot.db.create_ticket(str(channel.id), str(interaction.user.id), ticket_type)
+            ticket_id = await self.bot.db.create_ticket(str(channel.id), str(interaction.user.id), ticket_type)
             
             # Embed de boas-vindas
             emoji = "🎫" if ticket_type == "ticket" else "🛒"
@@ -249,7 +322,7 @@ class ConfirmCloseView(discord.ui.View):
     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
         
-        ticket_data = self.bot.db.get_ticket(str(interaction.channel.id))
+        ticket_data = await self.bot.db.get_ticket(str(interaction.channel.id))
         if not ticket_data:
             return await interaction.followup.send("❌ Ticket não encontrado no banco de dados!")
         
@@ -261,7 +334,9 @@ class ConfirmCloseView(discord.ui.View):
         await interaction.followup.send(embed=embed)
         
         try:
-            transcript_path = await TranscriptGenerator.generate(interaction.channel)
+            transcript_path = await self.bot.get_cog('Tickets').recorder.finalize(interaction.channel)
+            transcript = await self.bot.transcript_store.store(str(interaction.channel.id), transcript_path)
+            transcript_data = await self.bot.transcript_store.read(transcript)
             
             user = await self.bot.fetch_user(int(ticket_data['user_id']))
             dm_embed = EmbedBuilder.info(
@@ -272,11 +347,11 @@ class ConfirmCloseView(discord.ui.View):
             )
             
             try:
-                await user.send(embed=dm_embed, file=discord.File(transcript_path))
+                await user.send(embed=dm_embed, file=discord.File(io.BytesIO(transcript_data), filename=transcript['filename']))
             except:
                 logger.warning(f"Não foi possível enviar DM para {user.id}")
             
-            config = self.bot.db.get_config(str(interaction.guild.id))
+            config = await self.bot.db.get_config(str(interaction.guild.id))
             log_channel_id = int(config.get('log_channel', Config.LOG_CHANNEL_ID)) if config else Config.LOG_CHANNEL_ID
             log_channel = self.bot.get_channel(log_channel_id)
             if log_channel:
@@ -286,9 +361,12 @@ class ConfirmCloseView(discord.ui.View):
                     thumbnail=user.display_avatar.url,
                     footer_icon=interaction.guild.icon.url if interaction.guild.icon else None
                 )
-                await log_channel.send(embed=log_embed, file=discord.File(transcript_path))
+                await log_channel.send(embed=log_embed, file=discord.File(io.BytesIO(transcript_data), filename=transcript['filename']))
+            
+            await self.bot.db.close_ticket(str(interaction.channel.id), str(interaction.user.id), transcript['path'])
             
-            self.bot.db.close_ticket(str(interaction.channel.id), str(interaction.user.id), transcript_path)
+            # Mensagens recebidas durante os uploads recriam o log
+            await self.bot.get_cog('Tickets').recorder.discard(interaction.channel.id)
             
             rating_view = RatingView(self.bot, ticket_data, self.ticket_type)
             rating_embed = EmbedBuilder.create_embed(
@@ -354,7 +432,7 @@ class RatingView(discord.ui.View):
         if not self.service_rating:
             return await interaction.response.send_message("❌ Avalie o atendimento primeiro!", ephemeral=True)
         
-        self.bot.db.rate_ticket(
+        await self.bot.db.rate_ticket(
             self.ticket_data['ticket_id'],
             self.service_rating,
             self.service_rating,
@@ -220,7 +220,7 @@ class Utility(commands.Cog):
         uptime_text = Formatters.format_duration(int(uptime.total_seconds()))
         
         # Stats do banco
-        stats = self.bot.db.get_stats()
+        stats = await self.bot.db.get_stats()
         
         # Memória
         process = psutil.Process(os.getpid())
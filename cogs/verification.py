@@ -18,7 +18,7 @@ class Verification(commands.Cog):
         """Configurar painel de verificação"""
         
         # Verificar se há cargo configurado
-        config = self.bot.db.get_config(str(interaction.guild.id))
+        config = await self.bot.db.get_config(str(interaction.guild.id))
         
         if not config or not config.get('verified_role'):
             embed = EmbedBuilder.warning(
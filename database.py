@@ -3,34 +3,193 @@ import json
 import logging
 from datetime import datetime, timedelta
 import os
-import shutil
+import time
+import asyncio
+import functools
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from metrics import DB_QUERY_LATENCY
 
 logger = logging.getLogger('PandaBot.Database')
 
+# Contadores diários da tabela stats
+STAT_COLUMNS = (
+    'oauth_registrations',
+    'successful_pulls',
+    'failed_pulls',
+    'tickets_opened',
+    'tickets_closed'
+)
+
+# Tabelas incluídas nos snapshots incrementais e suas chaves primárias
+SNAPSHOT_TABLES = {
+    'oauth_users': 'user_id',
+    'tickets': 'ticket_id',
+    'blacklist': 'user_id',
+}
+
 class Database:
-    def __init__(self, db_path='data/bot.db'):
+    """Banco de dados SQLite com API assíncrona.
+
+    Toda operação de disco roda fora do event loop. As escritas passam por
+    uma única conexão de escrita, serializada em sua própria thread; as
+    leituras usam um pool de conexões somente-leitura (WAL), uma por thread,
+    e podem rodar em paralelo. Cada chamada usa seu próprio cursor.
+    Logs e contadores de estatísticas ficam em um buffer (write-behind) e
+    são gravados em lote, em uma única transação, pelo flusher.
+    Os métodos públicos são corrotinas; as implementações síncronas ficam
+    nos métodos ``_nome``.
+    """
+
+    def __init__(self, db_path='data/bot.db', read_pool_size=None):
         """Inicializar banco de dados"""
         os.makedirs('data', exist_ok=True)
         os.makedirs('backups', exist_ok=True)
-        
+
         self.db_path = db_path
-        # Usar check_same_thread=False para permitir acesso de múltiplas threads
+        self.closed = False
+
+        # Conexão de escrita (única). check_same_thread=False pois é criada
+        # aqui e usada apenas na thread de escrita
         self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
         self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
-        
+
         # Ativar WAL mode para melhor concorrência
-        self.cursor.execute("PRAGMA journal_mode=WAL")
-        self.cursor.execute("PRAGMA synchronous=NORMAL")
-        
-        self._create_tables()
-        logger.info(f"✅ Banco de dados inicializado em: {os.path.abspath(db_path)}")
-    
-    def _create_tables(self):
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+
+        self._run_migrations()
+
+        # Blacklist em memória (user_id -> registro), mantida pelas escritas
+        self._blacklist = self._load_blacklist()
+
+        # Canais de tickets abertos, consultados a cada mensagem recebida
+        self._open_tickets = self._load_open_tickets()
+
+        # Configurações já decodificadas por servidor (None = sem config)
+        self._config_cache = {}
+
+        # Resultado de get_stats por janela de dias: days -> (expira_em, stats)
+        self.stats_ttl = float(os.getenv('DB_STATS_TTL', '5'))
+        self._stats_cache = {}
+
+        # Conexão por thread: a thread de escrita usa self.conn, as de leitura
+        # abrem sua própria conexão somente-leitura no primeiro uso
+        self._local = threading.local()
+        self._read_conns = []
+        self._read_conns_lock = threading.Lock()
+
+        # Buffer de escrita (write-behind) para logs e contadores
+        self._pending_logs = []
+        self._pending_stats = {}
+        self._buffer_lock = threading.Lock()
+        self.flush_interval = int(os.getenv('DB_FLUSH_INTERVAL_MS', '1000')) / 1000
+        self.flush_max_rows = int(os.getenv('DB_FLUSH_MAX_ROWS', '100'))
+        self._loop = None
+        self._flush_event = None
+        self._flush_task = None
+
+        # Valores consultados pelo /health/ready sem tocar no banco
+        self._writes_queued = 0
+        self.last_backup_at = None
+
+        if read_pool_size is None:
+            read_pool_size = int(os.getenv('DB_READ_POOL_SIZE', '4'))
+
+        self._write_executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix='PandaBot-DB-Write',
+            initializer=self._init_writer_thread
+        )
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=max(1, read_pool_size),
+            thread_name_prefix='PandaBot-DB-Read'
+        )
+
+        logger.info(f"✅ Banco de dados inicializado em: {os.path.abspath(db_path)} ({read_pool_size} leitores)")
+
+    def _init_writer_thread(self):
+        self._local.conn = self.conn
+
+    def _open_reader(self):
+        """Abrir conexão somente-leitura para a thread atual"""
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA busy_timeout=5000")
+        with self._read_conns_lock:
+            self._read_conns.append(conn)
+        return conn
+
+    def _connection(self):
+        """Conexão da thread atual (escrita na thread de escrita, leitura nas demais)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_reader()
+            self._local.conn = conn
+        return conn
+
+    async def _read(self, func, *args, **kwargs):
+        """Executar leitura síncrona no pool de leitura"""
+        loop = asyncio.get_running_loop()
+        with DB_QUERY_LATENCY.time(method=func.__name__.lstrip('_'), kind='read'):
+            return await loop.run_in_executor(self._read_executor, functools.partial(func, *args, **kwargs))
+
+    async def _write(self, func, *args, **kwargs):
+        """Executar escrita síncrona na thread de escrita"""
+        loop = asyncio.get_running_loop()
+        self._writes_queued += 1
+        try:
+            with DB_QUERY_LATENCY.time(method=func.__name__.lstrip('_'), kind='write'):
+                return await loop.run_in_executor(self._write_executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self._writes_queued -= 1
+
+    @property
+    def write_queue_depth(self):
+        """Escritas aguardando ou em execução na thread de escrita"""
+        return self._writes_queued
+
+    # ==================== MIGRAÇÕES ====================
+
+    def _run_migrations(self):
+        """Aplicar migrações pendentes, versionadas por PRAGMA user_version"""
+        migrations = [
+            (1, "Esquema base", self._migration_base_schema),
+            (2, "UNIQUE(date) em stats", self._migration_stats_unique_date),
+            (3, "Índices de consultas frequentes", self._migration_lookup_indexes),
+            (4, "Armazenamento de transcrições", self._migration_transcript_store),
+            (5, "Log de alterações para snapshots incrementais", self._migration_snapshot_changes),
+            (6, "Tabela de metadados do bot", self._migration_meta),
+        ]
+
+        current = self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+        for version, description, migrate in migrations:
+            if version <= current:
+                continue
+
+            self.conn.execute("BEGIN")
+            try:
+                migrate()
+                self.conn.execute(f"PRAGMA user_version = {version}")
+                self.conn.execute("COMMIT")
+            except Exception as e:
+                self.conn.rollback()
+                logger.error(f"❌ Erro na migração {version} ({description}): {e}")
+                raise
+
+            logger.info(f"🔧 Migração {version} aplicada: {description}")
+
+        logger.info(f"✅ Esquema na versão {max(current, migrations[-1][0])}")
+
+    def _migration_base_schema(self):
         """Criar todas as tabelas necessárias"""
-        
+
         # Tabela de usuários OAuth2
-        self.cursor.execute("""
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS oauth_users (
                 user_id TEXT PRIMARY KEY,
                 access_token TEXT NOT NULL,
@@ -40,9 +199,9 @@ class Database:
                 last_pulled INTEGER DEFAULT 0
             )
         """)
-        
+
         # Tabela de tickets
-        self.cursor.execute("""
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS tickets (
                 ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
                 channel_id TEXT UNIQUE NOT NULL,
@@ -57,18 +216,18 @@ class Database:
                 transcript TEXT DEFAULT NULL
             )
         """)
-        
+
         # Tabela de configurações (suporta JSON)
-        self.cursor.execute("""
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS config (
                 guild_id TEXT PRIMARY KEY,
                 config_data TEXT NOT NULL,
                 updated_at INTEGER
             )
         """)
-        
+
         # Tabela de blacklist
-        self.cursor.execute("""
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS blacklist (
                 user_id TEXT PRIMARY KEY,
                 reason TEXT,
@@ -76,9 +235,9 @@ class Database:
                 added_at INTEGER
             )
         """)
-        
+
         # Tabela de logs
-        self.cursor.execute("""
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS logs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 type TEXT NOT NULL,
@@ -89,9 +248,9 @@ class Database:
                 timestamp INTEGER NOT NULL
             )
         """)
-        
+
         # Tabela de estatísticas
-        self.cursor.execute("""
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS stats (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 date TEXT NOT NULL,
@@ -102,9 +261,9 @@ class Database:
                 tickets_closed INTEGER DEFAULT 0
             )
         """)
-        
+
         # Tabela de avaliações
-        self.cursor.execute("""
+        self.conn.execute("""
             CREATE TABLE IF NOT EXISTS ratings (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 ticket_id INTEGER,
@@ -117,154 +276,446 @@ class Database:
                 FOREIGN KEY (ticket_id) REFERENCES tickets(ticket_id)
             )
         """)
-        
-        self.conn.commit()
-        logger.info("✅ Tabelas verificadas/criadas")
-    
+
+        # Tabela de produtos
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS products (
+                product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL,
+                eur_cents INTEGER NOT NULL,
+                brl_cents INTEGER NOT NULL,
+                description TEXT NOT NULL,
+                image_url TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                created_by TEXT NOT NULL,
+                updated_at INTEGER DEFAULT NULL
+            )
+        """)
+
+    def _migration_stats_unique_date(self):
+        """Mesclar linhas duplicadas de stats e garantir UNIQUE(date)"""
+        sums = ", ".join(
+            f"{col} = (SELECT SUM(s2.{col}) FROM stats s2 WHERE s2.date = stats.date)"
+            for col in STAT_COLUMNS
+        )
+
+        # A linha mais antiga de cada data recebe a soma das duplicadas
+        cur = self.conn.execute(f"""
+            UPDATE stats SET {sums}
+            WHERE id IN (SELECT MIN(id) FROM stats GROUP BY date HAVING COUNT(*) > 1)
+        """)
+        merged = cur.rowcount
+        self.conn.execute("""
+            DELETE FROM stats WHERE id NOT IN (SELECT MIN(id) FROM stats GROUP BY date)
+        """)
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_stats_date ON stats(date)")
+
+        if merged:
+            logger.info(f"🔧 Stats: {merged} datas duplicadas mescladas")
+
+    def _migration_lookup_indexes(self):
+        """Índices para as consultas mais frequentes"""
+        # get_user_tickets: filtra por user_id e ordena por created_at
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tickets_user_created
+            ON tickets(user_id, created_at DESC)
+        """)
+
+        # get_expired_tokens: intervalo em expires_at
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_oauth_users_expires_at
+            ON oauth_users(expires_at)
+        """)
+
+        # get_logs: ORDER BY timestamp DESC LIMIT ?
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_logs_timestamp
+            ON logs(timestamp)
+        """)
+
+    def _migration_transcript_store(self):
+        """Blobs de transcrição comprimidos (por hash) e índice ticket -> blob"""
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS transcript_blobs (
+                hash TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                created_at INTEGER NOT NULL
+            )
+        """)
+
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ticket_transcripts (
+                channel_id TEXT PRIMARY KEY,
+                blob_hash TEXT NOT NULL REFERENCES transcript_blobs(hash),
+                filename TEXT NOT NULL,
+                created_at INTEGER NOT NULL
+            )
+        """)
+
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_ticket_transcripts_blob
+            ON ticket_transcripts(blob_hash)
+        """)
+
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_ticket_transcripts_created
+            ON ticket_transcripts(created_at)
+        """)
+
+    def _migration_snapshot_changes(self):
+        """Triggers que registram as linhas alteradas desde o último snapshot"""
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshot_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                row_key TEXT NOT NULL
+            )
+        """)
+
+        for table, key in SNAPSHOT_TABLES.items():
+            for event, ref in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+                self.conn.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_snapshot
+                    AFTER {event} ON {table}
+                    BEGIN
+                        INSERT INTO snapshot_changes (tbl, row_key) VALUES ('{table}', {ref}.{key});
+                    END
+                """)
+
+    def _migration_meta(self):
+        """Pares chave/valor internos do bot (ex.: hash dos comandos sincronizados)"""
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                updated_at INTEGER NOT NULL
+            )
+        """)
+
     # ==================== OAUTH2 ====================
-    
-    def add_oauth_user(self, user_id, access_token, refresh_token, expires_at):
-        """Adicionar/atualizar usuário OAuth2"""
+
+    def _add_oauth_user(self, user_id, access_token, refresh_token, expires_at):
         try:
-            self.cursor.execute("""
-                INSERT OR REPLACE INTO oauth_users 
+            self.conn.execute("""
+                INSERT OR REPLACE INTO oauth_users
                 (user_id, access_token, refresh_token, expires_at, added_at)
                 VALUES (?, ?, ?, ?, ?)
             """, (user_id, access_token, refresh_token, expires_at, int(datetime.utcnow().timestamp())))
             self.conn.commit()
-            self.add_log('oauth', user_id, None, 'registered', 'OAuth2 autorizado')
-            self.increment_stat('oauth_registrations')
+            self._add_log('oauth', user_id, None, 'registered', 'OAuth2 autorizado')
+            self._increment_stat('oauth_registrations')
             logger.info(f"✅ OAuth2 salvo para usuário {user_id}")
         except Exception as e:
             logger.error(f"❌ Erro ao salvar OAuth2 para {user_id}: {e}")
             self.conn.rollback()
-    
-    def get_oauth_user(self, user_id):
-        """Obter dados OAuth2 de um usuário"""
+
+    async def add_oauth_user(self, user_id, access_token, refresh_token, expires_at):
+        """Adicionar/atualizar usuário OAuth2"""
+        return await self._write(self._add_oauth_user, user_id, access_token, refresh_token, expires_at)
+
+    def _get_oauth_user(self, user_id):
         try:
-            self.cursor.execute("SELECT * FROM oauth_users WHERE user_id = ?", (user_id,))
-            row = self.cursor.fetchone()
+            cur = self._connection().execute("SELECT * FROM oauth_users WHERE user_id = ?", (user_id,))
+            row = cur.fetchone()
             return dict(row) if row else None
         except Exception as e:
             logger.error(f"Erro ao buscar OAuth2 de {user_id}: {e}")
             return None
-    
-    def get_all_oauth_users(self):
-        """Obter todos os usuários OAuth2"""
+
+    async def get_oauth_user(self, user_id):
+        """Obter dados OAuth2 de um usuário"""
+        return await self._read(self._get_oauth_user, user_id)
+
+    def _get_all_oauth_users(self):
         try:
-            self.cursor.execute("SELECT * FROM oauth_users")
-            return [dict(row) for row in self.cursor.fetchall()]
+            cur = self._connection().execute("SELECT * FROM oauth_users")
+            return [dict(row) for row in cur.fetchall()]
         except Exception as e:
             logger.error(f"Erro ao buscar todos OAuth2: {e}")
             return []
-    
-    def remove_oauth_user(self, user_id):
-        """Remover usuário OAuth2"""
+
+    async def get_all_oauth_users(self):
+        """Obter todos os usuários OAuth2"""
+        return await self._read(self._get_all_oauth_users)
+
+    def _count_oauth_users(self):
+        try:
+            cur = self._connection().execute("SELECT COUNT(*) FROM oauth_users")
+            return cur.fetchone()[0]
+        except Exception as e:
+            logger.error(f"Erro ao contar OAuth2: {e}")
+            return 0
+
+    async def count_oauth_users(self):
+        """Contar usuários OAuth2"""
+        return await self._read(self._count_oauth_users)
+
+    def _remove_oauth_user(self, user_id):
         try:
-            self.cursor.execute("DELETE FROM oauth_users WHERE user_id = ?", (user_id,))
+            self.conn.execute("DELETE FROM oauth_users WHERE user_id = ?", (user_id,))
             self.conn.commit()
-            self.add_log('oauth', user_id, None, 'removed', 'OAuth2 revogado')
+            self._add_log('oauth', user_id, None, 'removed', 'OAuth2 revogado')
         except Exception as e:
             logger.error(f"Erro ao remover OAuth2 de {user_id}: {e}")
             self.conn.rollback()
-    
-    def update_last_pulled(self, user_id):
-        """Atualizar timestamp do último pull"""
+
+    async def remove_oauth_user(self, user_id):
+        """Remover usuário OAuth2"""
+        return await self._write(self._remove_oauth_user, user_id)
+
+    def _update_last_pulled(self, user_id):
         try:
-            self.cursor.execute("""
+            self.conn.execute("""
                 UPDATE oauth_users SET last_pulled = ? WHERE user_id = ?
             """, (int(datetime.utcnow().timestamp()), user_id))
             self.conn.commit()
         except Exception as e:
             logger.error(f"Erro ao atualizar last_pulled de {user_id}: {e}")
             self.conn.rollback()
-    
-    def get_expired_tokens(self):
-        """Obter tokens que expiram em menos de 24h"""
+
+    async def update_last_pulled(self, user_id):
+        """Atualizar timestamp do último pull"""
+        return await self._write(self._update_last_pulled, user_id)
+
+    def _get_expired_tokens(self):
         threshold = int((datetime.utcnow() + timedelta(hours=24)).timestamp())
         try:
-            self.cursor.execute("""
+            cur = self._connection().execute("""
                 SELECT * FROM oauth_users WHERE expires_at < ?
             """, (threshold,))
-            return [dict(row) for row in self.cursor.fetchall()]
+            return [dict(row) for row in cur.fetchall()]
         except Exception as e:
             logger.error(f"Erro ao buscar tokens expirados: {e}")
             return []
-    
+
+    async def get_expired_tokens(self):
+        """Obter tokens que expiram em menos de 24h"""
+        return await self._read(self._get_expired_tokens)
+
     # ==================== TICKETS ====================
-    
-    def create_ticket(self, channel_id, user_id, ticket_type):
-        """Criar novo ticket"""
+
+    def _load_open_tickets(self):
+        try:
+            cur = self.conn.execute("SELECT channel_id FROM tickets WHERE status = 'open'")
+            return {row['channel_id'] for row in cur.fetchall()}
+        except Exception as e:
+            logger.error(f"Erro ao carregar tickets abertos: {e}")
+            return set()
+
+    def _create_ticket(self, channel_id, user_id, ticket_type):
         try:
-            self.cursor.execute("""
+            cur = self.conn.execute("""
                 INSERT INTO tickets (channel_id, user_id, type, created_at)
                 VALUES (?, ?, ?, ?)
             """, (channel_id, user_id, ticket_type, int(datetime.utcnow().timestamp())))
+            ticket_id = cur.lastrowid
             self.conn.commit()
-            self.increment_stat('tickets_opened')
-            return self.cursor.lastrowid
+            self._open_tickets.add(channel_id)
+            self._increment_stat('tickets_opened')
+            return ticket_id
         except Exception as e:
             logger.error(f"Erro ao criar ticket: {e}")
             self.conn.rollback()
             return None
-    
-    def get_ticket(self, channel_id):
-        """Obter ticket por canal"""
+
+    async def create_ticket(self, channel_id, user_id, ticket_type):
+        """Criar novo ticket"""
+        return await self._write(self._create_ticket, channel_id, user_id, ticket_type)
+
+    async def is_open_ticket(self, channel_id):
+        """Verificar se o canal é um ticket aberto (memória)"""
+        return channel_id in self._open_tickets
+
+    async def get_open_ticket_channels(self):
+        """IDs dos canais de tickets abertos (memória)"""
+        return list(self._open_tickets)
+
+    def _get_ticket(self, channel_id):
         try:
-            self.cursor.execute("SELECT * FROM tickets WHERE channel_id = ?", (channel_id,))
-            row = self.cursor.fetchone()
+            cur = self._connection().execute("SELECT * FROM tickets WHERE channel_id = ?", (channel_id,))
+            row = cur.fetchone()
             return dict(row) if row else None
         except Exception as e:
             logger.error(f"Erro ao buscar ticket {channel_id}: {e}")
             return None
-    
-    def close_ticket(self, channel_id, closed_by, transcript):
-        """Fechar ticket"""
+
+    async def get_ticket(self, channel_id):
+        """Obter ticket por canal"""
+        return await self._read(self._get_ticket, channel_id)
+
+    def _close_ticket(self, channel_id, closed_by, transcript):
         try:
-            self.cursor.execute("""
-                UPDATE tickets 
+            self.conn.execute("""
+                UPDATE tickets
                 SET status = 'closed', closed_at = ?, closed_by = ?, transcript = ?
                 WHERE channel_id = ?
             """, (int(datetime.utcnow().timestamp()), closed_by, transcript, channel_id))
             self.conn.commit()
-            self.increment_stat('tickets_closed')
+            self._open_tickets.discard(channel_id)
+            self._increment_stat('tickets_closed')
         except Exception as e:
             logger.error(f"Erro ao fechar ticket {channel_id}: {e}")
             self.conn.rollback()
-    
-    def rate_ticket(self, ticket_id, rating, service_rating=None, product_rating=None, feedback=None):
-        """Avaliar ticket"""
+
+    async def close_ticket(self, channel_id, closed_by, transcript):
+        """Fechar ticket"""
+        return await self._write(self._close_ticket, channel_id, closed_by, transcript)
+
+    def _rate_ticket(self, ticket_id, rating, service_rating=None, product_rating=None, feedback=None):
         try:
-            self.cursor.execute("""
-                INSERT INTO ratings 
+            self.conn.execute("""
+                INSERT INTO ratings
                 (ticket_id, rating, service_rating, product_rating, feedback, created_at)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, (ticket_id, rating, service_rating, product_rating, feedback, 
+            """, (ticket_id, rating, service_rating, product_rating, feedback,
                   int(datetime.utcnow().timestamp())))
             self.conn.commit()
         except Exception as e:
             logger.error(f"Erro ao avaliar ticket {ticket_id}: {e}")
             self.conn.rollback()
-    
-    def get_user_tickets(self, user_id):
-        """Obter tickets de um usuário"""
+
+    async def rate_ticket(self, ticket_id, rating, service_rating=None, product_rating=None, feedback=None):
+        """Avaliar ticket"""
+        return await self._write(self._rate_ticket, ticket_id, rating, service_rating, product_rating, feedback)
+
+    def _get_user_tickets(self, user_id):
         try:
-            self.cursor.execute("""
+            cur = self._connection().execute("""
                 SELECT * FROM tickets WHERE user_id = ? ORDER BY created_at DESC
             """, (user_id,))
-            return [dict(row) for row in self.cursor.fetchall()]
+            return [dict(row) for row in cur.fetchall()]
         except Exception as e:
             logger.error(f"Erro ao buscar tickets de {user_id}: {e}")
             return []
-    
+
+    async def get_user_tickets(self, user_id):
+        """Obter tickets de um usuário"""
+        return await self._read(self._get_user_tickets, user_id)
+
+    def _get_all_tickets(self):
+        try:
+            cur = self._connection().execute("SELECT * FROM tickets ORDER BY created_at DESC")
+            return [dict(row) for row in cur.fetchall()]
+        except Exception as e:
+            logger.error(f"Erro ao buscar todos tickets: {e}")
+            return []
+
+    async def get_all_tickets(self):
+        """Obter todos os tickets"""
+        return await self._read(self._get_all_tickets)
+
+    # ==================== TRANSCRIÇÕES ====================
+
+    def _add_transcript(self, channel_id, blob_hash, path, filename, size, stored_size):
+        now = int(datetime.utcnow().timestamp())
+        try:
+            self.conn.execute("BEGIN")
+            # Blob com o mesmo hash já existe: apenas referenciar
+            self.conn.execute("""
+                INSERT OR IGNORE INTO transcript_blobs (hash, path, size, stored_size, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (blob_hash, path, size, stored_size, now))
+            self.conn.execute("""
+                INSERT OR REPLACE INTO ticket_transcripts (channel_id, blob_hash, filename, created_at)
+                VALUES (?, ?, ?, ?)
+            """, (channel_id, blob_hash, filename, now))
+            self.conn.execute("COMMIT")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao registrar transcrição de {channel_id}: {e}")
+            self.conn.rollback()
+            return False
+
+    async def add_transcript(self, channel_id, blob_hash, path, filename, size, stored_size):
+        """Registrar a transcrição de um ticket"""
+        return await self._write(self._add_transcript, channel_id, blob_hash, path, filename, size, stored_size)
+
+    def _prune_transcripts(self, older_than):
+        try:
+            self.conn.execute("BEGIN")
+            # tickets.transcript aponta para o blob; não deixar caminho apagado
+            self.conn.execute("""
+                UPDATE tickets SET transcript = NULL
+                WHERE channel_id IN (SELECT channel_id FROM ticket_transcripts WHERE created_at < ?)
+            """, (older_than,))
+            removed = self.conn.execute(
+                "DELETE FROM ticket_transcripts WHERE created_at < ?", (older_than,)
+            ).rowcount
+            cur = self.conn.execute("""
+                SELECT hash, path FROM transcript_blobs
+                WHERE hash NOT IN (SELECT blob_hash FROM ticket_transcripts)
+            """)
+            orphans = [dict(row) for row in cur.fetchall()]
+            self.conn.executemany(
+                "DELETE FROM transcript_blobs WHERE hash = ?",
+                [(orphan['hash'],) for orphan in orphans]
+            )
+            self.conn.execute("COMMIT")
+            return removed, [orphan['path'] for orphan in orphans]
+        except Exception as e:
+            logger.error(f"Erro ao limpar transcrições: {e}")
+            self.conn.rollback()
+            return 0, []
+
+    async def prune_transcripts(self, older_than):
+        """Remover transcrições anteriores a older_than; retorna (removidas, blobs órfãos)"""
+        return await self._write(self._prune_transcripts, older_than)
+
+    def _get_transcript_usage(self):
+        try:
+            cur = self._connection().execute("""
+                SELECT COUNT(*) AS blobs,
+                       COALESCE(SUM(size), 0) AS size,
+                       COALESCE(SUM(stored_size), 0) AS stored_size
+                FROM transcript_blobs
+            """)
+            return dict(cur.fetchone())
+        except Exception as e:
+            logger.error(f"Erro ao calcular uso das transcrições: {e}")
+            return {'blobs': 0, 'size': 0, 'stored_size': 0}
+
+    async def get_transcript_usage(self):
+        """Total de blobs e bytes (original/comprimido) das transcrições"""
+        return await self._read(self._get_transcript_usage)
+
+    # ==================== META ====================
+
+    def _get_meta(self, key):
+        try:
+            cur = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,))
+            row = cur.fetchone()
+            return row['value'] if row else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar meta {key}: {e}")
+            return None
+
+    async def get_meta(self, key):
+        """Obter valor interno do bot"""
+        return await self._read(self._get_meta, key)
+
+    def _set_meta(self, key, value):
+        try:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO meta (key, value, updated_at) VALUES (?, ?, ?)
+            """, (key, value, int(datetime.utcnow().timestamp())))
+            self.conn.commit()
+        except Exception as e:
+            logger.error(f"Erro ao salvar meta {key}: {e}")
+            self.conn.rollback()
+
+    async def set_meta(self, key, value):
+        """Definir valor interno do bot"""
+        return await self._write(self._set_meta, key, value)
+
     # ==================== CONFIG ====================
-    
-    def get_config(self, guild_id):
-        """Obter configurações do servidor"""
+
+    def _get_config(self, guild_id):
         try:
-            self.cursor.execute("SELECT * FROM config WHERE guild_id = ?", (guild_id,))
-            row = self.cursor.fetchone()
-            
+            cur = self._connection().execute("SELECT * FROM config WHERE guild_id = ?", (guild_id,))
+            row = cur.fetchone()
+
             if row:
                 try:
                     config_data = json.loads(row['config_data'])
@@ -275,153 +726,273 @@ class Database:
         except Exception as e:
             logger.error(f"Erro ao buscar config de {guild_id}: {e}")
             return None
-    
-    def set_config(self, guild_id, key, value):
-        """Definir configuração específica"""
+
+    async def get_config(self, guild_id):
+        """Obter configurações do servidor (cache; não modificar o dict retornado)"""
+        if guild_id in self._config_cache:
+            return self._config_cache[guild_id]
+
+        config_data = await self._read(self._get_config, guild_id)
+        # setdefault: uma escrita concluída durante a leitura tem prioridade
+        return self._config_cache.setdefault(guild_id, config_data)
+
+    def _set_config(self, guild_id, key, value):
         try:
-            current_config = self.get_config(guild_id) or {}
+            if guild_id in self._config_cache:
+                current_config = dict(self._config_cache[guild_id] or {})
+            else:
+                current_config = self._get_config(guild_id) or {}
             current_config[key] = value
             current_config['updated_at'] = int(datetime.utcnow().timestamp())
-            
+
             config_json = json.dumps(current_config)
-            
-            self.cursor.execute("""
+
+            self.conn.execute("""
                 INSERT OR REPLACE INTO config (guild_id, config_data, updated_at)
                 VALUES (?, ?, ?)
             """, (guild_id, config_json, current_config['updated_at']))
-            
+
             self.conn.commit()
+            self._config_cache[guild_id] = current_config
         except Exception as e:
             logger.error(f"Erro ao salvar config de {guild_id}: {e}")
             self.conn.rollback()
-    
-    def set_full_config(self, guild_id, config_dict):
-        """Definir configuração completa"""
+
+    async def set_config(self, guild_id, key, value):
+        """Definir configuração específica"""
+        return await self._write(self._set_config, guild_id, key, value)
+
+    def _set_full_config(self, guild_id, config_dict):
         try:
             config_dict['updated_at'] = int(datetime.utcnow().timestamp())
             config_json = json.dumps(config_dict)
-            
-            self.cursor.execute("""
+
+            self.conn.execute("""
                 INSERT OR REPLACE INTO config (guild_id, config_data, updated_at)
                 VALUES (?, ?, ?)
             """, (guild_id, config_json, config_dict['updated_at']))
-            
+
             self.conn.commit()
+            self._config_cache[guild_id] = dict(config_dict)
         except Exception as e:
             logger.error(f"Erro ao salvar full config de {guild_id}: {e}")
             self.conn.rollback()
-    
+
+    async def set_full_config(self, guild_id, config_dict):
+        """Definir configuração completa"""
+        return await self._write(self._set_full_config, guild_id, config_dict)
+
     # ==================== BLACKLIST ====================
-    
-    def add_to_blacklist(self, user_id, reason, added_by):
-        """Adicionar à blacklist"""
+
+    def _load_blacklist(self):
+        try:
+            cur = self.conn.execute("SELECT * FROM blacklist")
+            return {row['user_id']: dict(row) for row in cur.fetchall()}
+        except Exception as e:
+            logger.error(f"Erro ao carregar blacklist: {e}")
+            return {}
+
+    def _add_to_blacklist(self, user_id, reason, added_by):
         try:
-            self.cursor.execute("""
+            added_at = int(datetime.utcnow().timestamp())
+            self.conn.execute("""
                 INSERT OR REPLACE INTO blacklist (user_id, reason, added_by, added_at)
                 VALUES (?, ?, ?, ?)
-            """, (user_id, reason, added_by, int(datetime.utcnow().timestamp())))
+            """, (user_id, reason, added_by, added_at))
             self.conn.commit()
-            self.add_log('blacklist', user_id, None, 'added', reason)
+            self._blacklist[user_id] = {
+                'user_id': user_id,
+                'reason': reason,
+                'added_by': added_by,
+                'added_at': added_at
+            }
+            self._add_log('blacklist', user_id, None, 'added', reason)
         except Exception as e:
             logger.error(f"Erro ao adicionar {user_id} à blacklist: {e}")
             self.conn.rollback()
-    
-    def remove_from_blacklist(self, user_id):
-        """Remover da blacklist"""
+
+    async def add_to_blacklist(self, user_id, reason, added_by):
+        """Adicionar à blacklist"""
+        return await self._write(self._add_to_blacklist, user_id, reason, added_by)
+
+    def _remove_from_blacklist(self, user_id):
         try:
-            self.cursor.execute("DELETE FROM blacklist WHERE user_id = ?", (user_id,))
+            self.conn.execute("DELETE FROM blacklist WHERE user_id = ?", (user_id,))
             self.conn.commit()
-            self.add_log('blacklist', user_id, None, 'removed', 'Removido da blacklist')
+            self._blacklist.pop(user_id, None)
+            self._add_log('blacklist', user_id, None, 'removed', 'Removido da blacklist')
         except Exception as e:
             logger.error(f"Erro ao remover {user_id} da blacklist: {e}")
             self.conn.rollback()
-    
-    def is_blacklisted(self, user_id):
-        """Verificar se está na blacklist"""
+
+    async def remove_from_blacklist(self, user_id):
+        """Remover da blacklist"""
+        return await self._write(self._remove_from_blacklist, user_id)
+
+    async def is_blacklisted(self, user_id):
+        """Verificar se está na blacklist (memória)"""
+        return user_id in self._blacklist
+
+    async def get_blacklist_entry(self, user_id):
+        """Obter o registro da blacklist de um usuário (memória)"""
+        entry = self._blacklist.get(user_id)
+        return dict(entry) if entry else None
+
+    async def get_all_blacklisted(self):
+        """Obter todos da blacklist (memória)"""
+        return [dict(entry) for entry in list(self._blacklist.values())]
+
+    # ==================== WRITE-BEHIND ====================
+
+    def _notify_buffer(self):
+        """Acordar o flusher quando o buffer atinge o limite de linhas"""
+        if self._loop is None or self.pending_writes < self.flush_max_rows:
+            return
         try:
-            self.cursor.execute("SELECT * FROM blacklist WHERE user_id = ?", (user_id,))
-            return self.cursor.fetchone() is not None
-        except Exception as e:
-            logger.error(f"Erro ao verificar blacklist de {user_id}: {e}")
-            return False
-    
-    def get_all_blacklisted(self):
-        """Obter todos da blacklist"""
+            self._loop.call_soon_threadsafe(self._flush_event.set)
+        except RuntimeError:
+            # Loop já encerrado; o flush final em close() grava o restante
+            pass
+
+    @property
+    def pending_writes(self):
+        """Linhas aguardando gravação no buffer de escrita"""
+        return len(self._pending_logs) + len(self._pending_stats)
+
+    def _flush_buffers(self):
+        """Gravar logs e contadores pendentes em uma única transação"""
+        with self._buffer_lock:
+            logs, self._pending_logs = self._pending_logs, []
+            stats, self._pending_stats = self._pending_stats, {}
+
+        if not logs and not stats:
+            return 0
+
         try:
-            self.cursor.execute("SELECT * FROM blacklist")
-            return [dict(row) for row in self.cursor.fetchall()]
+            self.conn.execute("BEGIN")
+            if logs:
+                self.conn.executemany("""
+                    INSERT INTO logs (type, user_id, guild_id, action, details, timestamp)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, logs)
+            for (date, stat_type), amount in stats.items():
+                self.conn.execute(f"""
+                    INSERT INTO stats (date, {stat_type}) VALUES (?, ?)
+                    ON CONFLICT(date) DO UPDATE SET {stat_type} = {stat_type} + excluded.{stat_type}
+                """, (date, amount))
+            self.conn.execute("COMMIT")
+            return len(logs) + len(stats)
         except Exception as e:
-            logger.error(f"Erro ao buscar blacklist: {e}")
-            return []
-    
+            logger.error(f"Erro ao gravar buffer de escrita: {e}")
+            self.conn.rollback()
+            # Devolver ao buffer para a próxima tentativa
+            with self._buffer_lock:
+                self._pending_logs[:0] = logs
+                for key, amount in stats.items():
+                    self._pending_stats[key] = self._pending_stats.get(key, 0) + amount
+            return 0
+
+    async def flush(self):
+        """Gravar imediatamente o buffer de escrita"""
+        return await self._write(self._flush_buffers)
+
+    def start_flusher(self):
+        """Iniciar a tarefa de flush periódico (requer event loop ativo)"""
+        if self._flush_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._flush_event = asyncio.Event()
+        self._flush_task = self._loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """Gravar o buffer a cada flush_interval ou ao atingir flush_max_rows"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Erro no flush do buffer de escrita: {e}")
+
     # ==================== LOGS ====================
-    
-    def add_log(self, log_type, user_id, guild_id, action, details):
+
+    def _add_log(self, log_type, user_id, guild_id, action, details):
+        """Enfileirar log no buffer de escrita (gravado pelo flush)"""
+        row = (log_type, user_id, guild_id, action, details, int(datetime.utcnow().timestamp()))
+        with self._buffer_lock:
+            self._pending_logs.append(row)
+        self._notify_buffer()
+
+    async def add_log(self, log_type, user_id, guild_id, action, details):
         """Adicionar log"""
+        self._add_log(log_type, user_id, guild_id, action, details)
+
+    def _get_logs(self, limit=100):
         try:
-            self.cursor.execute("""
-                INSERT INTO logs (type, user_id, guild_id, action, details, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (log_type, user_id, guild_id, action, details, 
-                  int(datetime.utcnow().timestamp())))
-            self.conn.commit()
-        except Exception as e:
-            logger.error(f"Erro ao adicionar log: {e}")
-            self.conn.rollback()
-    
-    def get_logs(self, limit=100):
-        """Obter logs recentes"""
-        try:
-            self.cursor.execute("""
+            cur = self._connection().execute("""
                 SELECT * FROM logs ORDER BY timestamp DESC LIMIT ?
             """, (limit,))
-            return [dict(row) for row in self.cursor.fetchall()]
+            return [dict(row) for row in cur.fetchall()]
         except Exception as e:
             logger.error(f"Erro ao buscar logs: {e}")
             return []
-    
+
+    async def get_logs(self, limit=100):
+        """Obter logs recentes"""
+        return await self._read(self._get_logs, limit)
+
     # ==================== ESTATÍSTICAS ====================
-    
-    def increment_stat(self, stat_type):
+
+    def _increment_stat(self, stat_type):
+        """Acumular incremento no buffer de escrita (gravado pelo flush)"""
+        if stat_type not in STAT_COLUMNS:
+            logger.error(f"Erro ao incrementar stat {stat_type}: coluna desconhecida")
+            return
+
+        today = datetime.utcnow().date().isoformat()
+        with self._buffer_lock:
+            key = (today, stat_type)
+            self._pending_stats[key] = self._pending_stats.get(key, 0) + 1
+        self._notify_buffer()
+
+    async def increment_stat(self, stat_type):
         """Incrementar estatística do dia"""
+        self._increment_stat(stat_type)
+
+    def _get_stats(self, days=7):
+        empty_totals = {col: 0 for col in STAT_COLUMNS}
         try:
-            today = datetime.utcnow().date().isoformat()
-            
-            self.cursor.execute("SELECT * FROM stats WHERE date = ?", (today,))
-            if self.cursor.fetchone():
-                self.cursor.execute(f"""
-                    UPDATE stats SET {stat_type} = {stat_type} + 1 WHERE date = ?
-                """, (today,))
-            else:
-                self.cursor.execute(f"""
-                    INSERT INTO stats (date, {stat_type}) VALUES (?, 1)
-                """, (today,))
-            self.conn.commit()
-        except Exception as e:
-            logger.error(f"Erro ao incrementar stat {stat_type}: {e}")
-            self.conn.rollback()
-    
-    def get_stats(self, days=7):
-        """Obter estatísticas"""
-        try:
-            self.cursor.execute("""
-                SELECT * FROM stats 
+            conn = self._connection()
+
+            # Contagens agregadas no SQLite, sem carregar as linhas
+            row = conn.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM oauth_users) AS total_users,
+                    (SELECT COUNT(*) FROM blacklist) AS total_blacklisted,
+                    (SELECT COUNT(*) FROM tickets) AS total_tickets
+            """).fetchone()
+
+            cur = conn.execute("""
+                SELECT * FROM stats
                 WHERE date >= date('now', '-' || ? || ' days')
                 ORDER BY date DESC
             """, (days,))
-            
-            stats_list = [dict(row) for row in self.cursor.fetchall()]
-            
-            total_users = len(self.get_all_oauth_users())
-            total_blacklisted = len(self.get_all_blacklisted())
-            
-            self.cursor.execute("SELECT COUNT(*) as total FROM tickets")
-            total_tickets = self.cursor.fetchone()['total']
-            
+            stats_list = [dict(row) for row in cur.fetchall()]
+
+            sums = ", ".join(f"COALESCE(SUM({col}), 0) AS {col}" for col in STAT_COLUMNS)
+            totals = conn.execute(f"""
+                SELECT {sums} FROM stats
+                WHERE date >= date('now', '-' || ? || ' days')
+            """, (days,)).fetchone()
+
             return {
-                'total_users': total_users,
-                'total_blacklisted': total_blacklisted,
-                'total_tickets': total_tickets,
+                'total_users': row['total_users'],
+                'total_blacklisted': row['total_blacklisted'],
+                'total_tickets': row['total_tickets'],
+                'totals': dict(totals),
                 'daily_stats': stats_list
             }
         except Exception as e:
@@ -430,45 +1001,291 @@ class Database:
                 'total_users': 0,
                 'total_blacklisted': 0,
                 'total_tickets': 0,
+                'totals': empty_totals,
                 'daily_stats': []
             }
-    
+
+    async def get_stats(self, days=7, fresh=False):
+        """Obter estatísticas (resultado reaproveitado por ``stats_ttl`` segundos)"""
+        now = time.monotonic()
+        cached = self._stats_cache.get(days)
+        if not fresh and cached and cached[0] > now:
+            return cached[1]
+
+        stats = await self._read(self._get_stats, days)
+        self._stats_cache[days] = (time.monotonic() + self.stats_ttl, stats)
+        return stats
+
+    # ==================== PRODUTOS ====================
+
+    def _add_product(self, name, eur_cents, brl_cents, description, image_url, created_by):
+        try:
+            self.conn.execute("""
+                INSERT INTO products (name, eur_cents, brl_cents, description, image_url, created_at, created_by)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (name, eur_cents, brl_cents, description, image_url, int(datetime.utcnow().timestamp()), created_by))
+            self.conn.commit()
+            logger.info(f"✅ Produto '{name}' salvo no banco")
+        except Exception as e:
+            logger.error(f"Erro ao salvar produto: {e}")
+            self.conn.rollback()
+
+    async def add_product(self, name, eur_cents, brl_cents, description, image_url, created_by):
+        """Salvar produto no banco"""
+        return await self._write(self._add_product, name, eur_cents, brl_cents, description, image_url, created_by)
+
+    def _get_product_by_name(self, name):
+        try:
+            cur = self._connection().execute("SELECT * FROM products WHERE name = ?", (name,))
+            row = cur.fetchone()
+            return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"Erro ao buscar produto: {e}")
+            return None
+
+    async def get_product_by_name(self, name):
+        """Buscar produto por nome"""
+        return await self._read(self._get_product_by_name, name)
+
+    def _get_all_products(self):
+        try:
+            cur = self._connection().execute("SELECT * FROM products ORDER BY name")
+            return [dict(row) for row in cur.fetchall()]
+        except Exception as e:
+            logger.error(f"Erro ao buscar produtos: {e}")
+            return []
+
+    async def get_all_products(self):
+        """Buscar todos os produtos"""
+        return await self._read(self._get_all_products)
+
+    def _update_product(self, product_id, **kwargs):
+        try:
+            fields = []
+            values = []
+
+            for key, value in kwargs.items():
+                fields.append(f"{key} = ?")
+                values.append(value)
+
+            fields.append("updated_at = ?")
+            values.append(int(datetime.utcnow().timestamp()))
+
+            values.append(product_id)
+
+            query = f"UPDATE products SET {', '.join(fields)} WHERE product_id = ?"
+            self.conn.execute(query, values)
+            self.conn.commit()
+            logger.info(f"✅ Produto ID {product_id} atualizado")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao atualizar produto: {e}")
+            self.conn.rollback()
+            return False
+
+    async def update_product(self, product_id, **kwargs):
+        """Atualizar produto"""
+        return await self._write(self._update_product, product_id, **kwargs)
+
+    def _delete_product(self, product_id):
+        try:
+            self.conn.execute("DELETE FROM products WHERE product_id = ?", (product_id,))
+            self.conn.commit()
+            logger.info(f"✅ Produto ID {product_id} deletado")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao deletar produto: {e}")
+            self.conn.rollback()
+            return False
+
+    async def delete_product(self, product_id):
+        """Deletar produto"""
+        return await self._write(self._delete_product, product_id)
+
+    # ==================== SNAPSHOTS ====================
+
+    def _get_snapshot_changes(self):
+        """Linhas alteradas desde o último snapshot: (seq, [(tabela, chave, linha|None)])"""
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                cur = conn.execute("""
+                    SELECT tbl, row_key, MAX(seq) AS seq FROM snapshot_changes
+                    GROUP BY tbl, row_key ORDER BY seq
+                """)
+                pending = cur.fetchall()
+                max_seq = max((row['seq'] for row in pending), default=0)
+
+                changes = []
+                for row in pending:
+                    key_column = SNAPSHOT_TABLES[row['tbl']]
+                    current = conn.execute(
+                        f"SELECT * FROM {row['tbl']} WHERE {key_column} = ?", (row['row_key'],)
+                    ).fetchone()
+                    changes.append((row['tbl'], row['row_key'], dict(current) if current else None))
+            finally:
+                conn.execute("COMMIT")
+            return max_seq, changes
+        except Exception as e:
+            logger.error(f"Erro ao buscar alterações para snapshot: {e}")
+            return 0, []
+
+    async def get_snapshot_changes(self):
+        """Obter alterações pendentes para o snapshot incremental"""
+        return await self._read(self._get_snapshot_changes)
+
+    def _get_snapshot_seq(self):
+        cur = self._connection().execute("SELECT COALESCE(MAX(seq), 0) FROM snapshot_changes")
+        return cur.fetchone()[0]
+
+    async def get_snapshot_seq(self):
+        """Sequência atual do log de alterações"""
+        return await self._read(self._get_snapshot_seq)
+
+    def _ack_snapshot_changes(self, seq):
+        try:
+            self.conn.execute("DELETE FROM snapshot_changes WHERE seq <= ?", (seq,))
+            self.conn.commit()
+        except Exception as e:
+            logger.error(f"Erro ao limpar log de alterações: {e}")
+            self.conn.rollback()
+
+    async def ack_snapshot_changes(self, seq):
+        """Descartar alterações já gravadas em snapshot"""
+        return await self._write(self._ack_snapshot_changes, seq)
+
+    def _restore_rows(self, tables):
+        """Inserir as linhas do snapshot em lote, em uma única transação"""
+        counts = {}
+        try:
+            self.conn.execute("BEGIN")
+            seq_before = self._get_snapshot_seq()
+
+            for table, rows in tables.items():
+                if table not in SNAPSHOT_TABLES:
+                    continue
+                columns = {row['name'] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+
+                # Agrupar por conjunto de colunas (snapshots antigos podem ter menos colunas)
+                groups = {}
+                for row in rows:
+                    keys = tuple(key for key in row if key in columns)
+                    groups.setdefault(keys, []).append(tuple(row[key] for key in keys))
+
+                for keys, values in groups.items():
+                    self.conn.executemany(
+                        f"INSERT OR REPLACE INTO {table} ({', '.join(keys)}) "
+                        f"VALUES ({', '.join('?' for _ in keys)})",
+                        values
+                    )
+                counts[table] = len(rows)
+
+            # As linhas restauradas já estão no snapshot
+            self.conn.execute("DELETE FROM snapshot_changes WHERE seq > ?", (seq_before,))
+            self.conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"❌ Erro ao restaurar linhas do snapshot: {e}")
+            self.conn.rollback()
+            return None
+
+        # Recarregar os caches derivados das tabelas restauradas
+        self._blacklist = self._load_blacklist()
+        self._open_tickets = self._load_open_tickets()
+        return counts
+
+    async def restore_rows(self, tables):
+        """Restaurar {tabela: [linhas]} em lote; retorna linhas por tabela ou None"""
+        return await self._write(self._restore_rows, tables)
+
     # ==================== BACKUP ====================
-    
-    def backup(self):
+
+    @staticmethod
+    def _temp_file_for(path):
+        """Criar um temporário exclusivo no diretório de ``path`` (mesmo sistema de arquivos)"""
+        directory, name = os.path.split(os.path.abspath(path))
+        return tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory)
+
+    def _copy_database(self, backup_path):
+        """Copiar o banco com a API de backup online do SQLite, em etapas"""
+        pages = int(os.getenv('DB_BACKUP_PAGES', '256'))
+        step_pause = int(os.getenv('DB_BACKUP_PAUSE_MS', '5')) / 1000
+
+        # Backups no mesmo segundo geram o mesmo nome; o temporário é único
+        fd, tmp_path = self._temp_file_for(backup_path)
+        os.close(fd)
+
+        try:
+            source = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, isolation_level=None)
+            target = sqlite3.connect(tmp_path)
+            try:
+                # Transação de leitura aberta durante todo o backup: com WAL o
+                # snapshot fica fixo entre as etapas e os escritores não bloqueiam
+                source.execute("BEGIN")
+                source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+                source.backup(
+                    target,
+                    pages=pages,
+                    progress=lambda status, remaining, total: time.sleep(step_pause)
+                )
+                source.execute("COMMIT")
+            finally:
+                target.close()
+                source.close()
+
+            os.replace(tmp_path, backup_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def copy_database(self, backup_path):
+        """Copiar banco para o caminho indicado sem bloquear leituras/escritas"""
+        # Incluir logs e estatísticas ainda no buffer
+        await self.flush()
+        await asyncio.to_thread(self._copy_database, backup_path)
+        self.last_backup_at = int(datetime.utcnow().timestamp())
+
+    def _cleanup_backups(self, keep=30):
+        backups = sorted(
+            [f for f in os.listdir('backups') if f.startswith('backup_') and f.endswith('.db')],
+            reverse=True
+        )
+        for old_backup in backups[keep:]:
+            try:
+                os.remove(os.path.join('backups', old_backup))
+                logger.info(f"🗑️ Backup antigo removido: {old_backup}")
+            except:
+                pass
+
+    async def backup(self):
         """Criar backup do banco de dados"""
         timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
         backup_path = f'backups/backup_{timestamp}.db'
-        
+
         try:
-            # Forçar sincronização antes do backup
-            self.conn.commit()
-            
-            # Fazer checkpoint do WAL
-            self.cursor.execute("PRAGMA wal_checkpoint(FULL)")
-            
-            shutil.copy2(self.db_path, backup_path)
+            await self.copy_database(backup_path)
             logger.info(f"💾 Backup criado: {backup_path}")
-            
+
             # Manter apenas últimos 30 backups
-            backups = sorted(
-                [f for f in os.listdir('backups') if f.startswith('backup_') and f.endswith('.db')],
-                reverse=True
-            )
-            for old_backup in backups[30:]:
-                try:
-                    os.remove(os.path.join('backups', old_backup))
-                    logger.info(f"🗑️ Backup antigo removido: {old_backup}")
-                except:
-                    pass
-                
+            await asyncio.to_thread(self._cleanup_backups, 30)
+
             return backup_path
         except Exception as e:
             logger.error(f"❌ Erro ao criar backup: {e}")
             return None
-    
-    def get_all_backups(self):
-        """Obter lista de todos os backups"""
+
+    def _integrity_check(self, quick=False):
+        pragma = "quick_check" if quick else "integrity_check"
+        cur = self._connection().execute(f"PRAGMA {pragma}")
+        return cur.fetchone()[0]
+
+    async def integrity_check(self, quick=False):
+        """Executar PRAGMA integrity_check (ou quick_check) e retornar o resultado"""
+        return await self._read(self._integrity_check, quick)
+
+    def _get_all_backups(self):
         try:
             backups = []
             for filename in os.listdir('backups'):
@@ -476,7 +1293,7 @@ class Database:
                     filepath = os.path.join('backups', filename)
                     size = os.path.getsize(filepath)
                     mtime = os.path.getmtime(filepath)
-                    
+
                     backups.append({
                         'filename': filename,
                         'filepath': filepath,
@@ -484,49 +1301,114 @@ class Database:
                         'size_mb': round(size / (1024 * 1024), 2),
                         'created_at': datetime.fromtimestamp(mtime).isoformat()
                     })
-            
+
             return sorted(backups, key=lambda x: x['created_at'], reverse=True)
         except Exception as e:
             logger.error(f"Erro ao listar backups: {e}")
             return []
-    
-    def export_json(self):
-        """Exportar dados para JSON"""
+
+    async def get_all_backups(self):
+        """Obter lista de todos os backups"""
+        return await self._read(self._get_all_backups)
+
+    def _dump_json(self, path, meta, stats_days=7):
+        """Gravar snapshot JSON linha a linha direto do cursor, de forma atômica.
+
+        Tudo é lido em uma única transação (snapshot consistente) e gravado
+        em um arquivo temporário que só substitui ``path`` após o fsync; uma
+        falha no meio deixa o arquivo anterior intacto.
+        """
+        conn = self._connection()
+        tmp_path = None
+        counts = {}
+
+        def encode(value):
+            return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+        conn.execute("BEGIN")
+        try:
+            change_seq = self._get_snapshot_seq()
+
+            # Nome único: dumps simultâneos não compartilham o temporário
+            fd, tmp_path = self._temp_file_for(path)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write("{")
+                for key, value in {**meta, 'change_seq': change_seq}.items():
+                    f.write(f"{encode(key)}:{encode(value)},")
+
+                for table in SNAPSHOT_TABLES:
+                    f.write(f"{encode(table)}:[")
+                    counts[table] = 0
+                    for row in conn.execute(f"SELECT * FROM {table}"):
+                        f.write(("," if counts[table] else "") + "\n" + encode(dict(row)))
+                        counts[table] += 1
+                    f.write("\n],")
+
+                f.write(f"{encode('stats')}:{encode(self._get_stats(stats_days))}}}\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            os.replace(tmp_path, path)
+        except Exception:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            conn.execute("COMMIT")
+
+        # Persistir a renomeação
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+        return change_seq, counts
+
+    async def dump_json(self, path, meta, stats_days=7):
+        """Gravar snapshot JSON atômico; retorna (change_seq, linhas por tabela)"""
+        return await self._read(self._dump_json, path, meta, stats_days)
+
+    def _export_json(self):
         try:
-            data = {
-                'exported_at': datetime.utcnow().isoformat(),
-                'oauth_users': self.get_all_oauth_users(),
-                'tickets': self.get_all_tickets(),
-                'blacklist': self.get_all_blacklisted(),
-                'stats': self.get_stats(30)
-            }
-            
             timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
             json_path = f'backups/export_{timestamp}.json'
-            
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
+
+            self._dump_json(json_path, {'exported_at': datetime.utcnow().isoformat()}, stats_days=30)
+
             logger.info(f"📄 Exportado para JSON: {json_path}")
             return json_path
         except Exception as e:
             logger.error(f"Erro ao exportar JSON: {e}")
             return None
-    
-    def get_all_tickets(self):
-        """Obter todos os tickets"""
-        try:
-            self.cursor.execute("SELECT * FROM tickets ORDER BY created_at DESC")
-            return [dict(row) for row in self.cursor.fetchall()]
-        except Exception as e:
-            logger.error(f"Erro ao buscar todos tickets: {e}")
-            return []
-    
-    def close(self):
-        """Fechar conexão"""
+
+    async def export_json(self):
+        """Exportar dados para JSON"""
+        return await self._read(self._export_json)
+
+    def _close(self):
         try:
+            self._flush_buffers()
+            with self._read_conns_lock:
+                for conn in self._read_conns:
+                    conn.close()
+                self._read_conns.clear()
             self.conn.commit()
             self.conn.close()
             logger.info("🔒 Banco de dados fechado")
         except Exception as e:
             logger.error(f"Erro ao fechar banco: {e}")
+
+    async def close(self):
+        """Fechar conexões e encerrar as threads do banco"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        # Aguardar leituras pendentes antes de fechar as conexões
+        await asyncio.to_thread(self._read_executor.shutdown, wait=True)
+        await self._write(self._close)
+        self._write_executor.shutdown(wait=True)
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from metrics import LOOP_LAG, LOOP_STALLS
+
+logger = logging.getLogger('PandaBot.LoopMonitor')
+
+
+class LoopMonitor:
+    """Detecta bloqueios do event loop e mostra o que estava rodando.
+
+    Uma tarefa no loop registra um heartbeat a cada ``interval`` e mede o
+    atraso com que acorda. Uma thread de vigia confere o heartbeat: se ele
+    ficar parado por mais de ``threshold``, captura a pilha da thread do loop
+    e a corrotina em execução naquele momento.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv('LOOP_MONITOR_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.interval = int(os.getenv('LOOP_MONITOR_INTERVAL_MS', '100')) / 1000
+        self.threshold = int(os.getenv('LOOP_STALL_THRESHOLD_MS', '250')) / 1000
+
+        self._loop = None
+        self._loop_thread_id = None
+        self._last_beat = 0.0
+        self._stall = None
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Iniciar o heartbeat e a thread de vigia (requer event loop ativo)"""
+        if not self.enabled or self._task:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+
+        self._task = self._loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name='PandaBot-LoopMonitor', daemon=True)
+        self._watchdog.start()
+
+        logger.info(f"🩺 Monitor do event loop ativo (limite {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _lag(self, now, last_beat):
+        """Atraso além do sleep devido desde o último heartbeat"""
+        return max(0.0, now - last_beat - self.interval)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            beat, self._last_beat = self._last_beat, now
+
+            lag = self._lag(now, beat)
+            LOOP_LAG.observe(lag)
+
+            if lag >= self.threshold:
+                stall = self._stall if self._stall and self._stall['beat'] == beat else None
+                coroutine = stall['coroutine'] if stall else 'unknown'
+                LOOP_STALLS.inc(coroutine=coroutine)
+                logger.warning(f"🐢 Event loop ficou bloqueado por {lag * 1000:.0f}ms ({coroutine})")
+
+    def _watch(self):
+        """Thread de vigia: captura a pilha do loop quando o heartbeat atrasa"""
+        # Mesma medida do heartbeat. A pilha é capturada já na metade do
+        # limite: um bloqueio que chega ao limite dura pelo menos mais meio
+        # limite, tempo de sobra para algumas verificações
+        poll = min(self.interval, self.threshold) / 5
+        captured_beat = reported_beat = None
+        while not self._stopped.wait(poll):
+            last_beat = self._last_beat
+            lag = self._lag(time.monotonic(), last_beat)
+            if lag < self.threshold / 2:
+                continue
+
+            try:
+                if last_beat != captured_beat:
+                    captured_beat = last_beat
+                    self._stall = self._capture(last_beat)
+
+                # Um aviso por bloqueio, com a pilha do momento
+                if lag >= self.threshold and last_beat != reported_beat:
+                    reported_beat = last_beat
+                    self._stall = self._capture(last_beat)
+                    logger.warning(
+                        f"🐢 Event loop bloqueado há {lag * 1000:.0f}ms em {self._stall['source']}\n"
+                        f"{self._stall['stack']}"
+                    )
+            except Exception as e:
+                logger.error(f"Erro ao capturar a pilha do event loop: {e}")
+
+    def _capture(self, beat):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = ''.join(traceback.format_stack(frame)) if frame else ''
+
+        task = asyncio.current_task(self._loop)
+        if task:
+            coro = task.get_coro()
+            coroutine = getattr(coro, '__qualname__', repr(coro))
+            source = f"tarefa {task.get_name()} ({coroutine})"
+        else:
+            # Callback fora de uma Task (ex.: call_soon, transportes)
+            coroutine = 'callback'
+            source = 'callback do loop'
+
+        return {'beat': beat, 'coroutine': coroutine, 'source': source, 'stack': stack}
@@ -1,5 +1,7 @@
 import discord
+from discord import app_commands
 from discord.ext import commands, tasks
+import aiohttp
 import os
 import asyncio
 from dotenv import load_dotenv
@@ -7,11 +9,18 @@ from datetime import datetime, timezone
 import logging
 import signal
 import sys
+import time
+import json
+import hashlib
 
 # Importar módulos
 from database import Database
 from web_server import WebServer
 from backup_manager import BackupManager
+from token_refresher import TokenRefreshScheduler
+from transcript_store import TranscriptStore
+from loop_monitor import LoopMonitor
+from metrics import INTERACTION_LATENCY, INTERACTION_ERRORS, http_trace_config
 from utils import Logger, Config
 
 load_dotenv()
@@ -20,43 +29,158 @@ load_dotenv()
 Logger.setup()
 logger = logging.getLogger('PandaBot')
 
+def command_label(interaction):
+    """Nome do comando slash para os labels de métricas"""
+    return interaction.command.qualified_name if interaction.command else 'unknown'
+
+class InstrumentedCommandTree(app_commands.CommandTree):
+    """CommandTree que mede a duração de cada comando slash"""
+    
+    async def _call(self, interaction):
+        started = time.perf_counter()
+        try:
+            await super()._call(interaction)
+        finally:
+            INTERACTION_LATENCY.observe(time.perf_counter() - started, command=command_label(interaction))
+    
+    async def on_error(self, interaction, error):
+        INTERACTION_ERRORS.inc(command=command_label(interaction))
+        await super().on_error(interaction, error)
+
 class PandaBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.all()
         super().__init__(
             command_prefix=commands.when_mentioned_or(os.getenv('PREFIX', '!')),
             intents=intents,
-            help_command=None
+            help_command=None,
+            tree_cls=InstrumentedCommandTree,
+            http_trace=http_trace_config()
         )
         
         self.db = Database()
         self.backup_manager = BackupManager(self.db)
+        self.token_refresher = TokenRefreshScheduler(self)
+        self.transcript_store = TranscriptStore(self.db)
         self.web_server = None
+        self.http_session = None
         self.start_time = datetime.now(timezone.utc)
+        self.startup_task = None
+        self.loop_monitor = LoopMonitor()
+        
+        # Linha do tempo da inicialização (exposta em /health)
+        self._boot_clock = time.perf_counter()
+        self.startup_timeline = []
+        self.ready_after = None
         
+        # Contadores do ciclo de vida do gateway
+        self.startup_runs = 0
+        self.reconnect_runs = 0
+        self.resume_count = 0
+    
+    async def prepare_data(self):
+        """Verificar e restaurar dados antes de conectar (apenas o essencial)"""
         # 🔄 VERIFICAR E RESTAURAR DADOS NO INÍCIO
         logger.info("🔍 Verificando dados existentes...")
-        oauth_count = len(self.db.get_all_oauth_users())
+        oauth_count = await self.db.count_oauth_users()
         
         if oauth_count == 0:
             logger.warning("⚠️ Nenhum dado OAuth2 no banco, tentando restaurar do snapshot...")
-            if self.backup_manager.restore_from_snapshot():
-                oauth_count = len(self.db.get_all_oauth_users())
+            if await self.backup_manager.restore_from_snapshot():
+                oauth_count = await self.db.count_oauth_users()
                 logger.info(f"✅ {oauth_count} usuários OAuth2 restaurados do snapshot!")
             else:
                 logger.warning("⚠️ Nenhum snapshot disponível para restaurar")
         else:
             logger.info(f"✅ {oauth_count} usuários OAuth2 carregados do banco")
+    
+    async def startup_maintenance(self):
+        """Verificação de integridade e backup inicial, em segundo plano após conectar"""
+        try:
+            # quick_check: O(páginas), sem verificar índices
+            if not await self.backup_manager.verify_integrity(quick=True):
+                await self.alert_integrity_failure()
+            
+            # Criar backup inicial
+            logger.info("💾 Criando backup inicial...")
+            await self.backup_manager.create_full_backup()
+        except Exception as e:
+            logger.error(f"❌ Erro na manutenção de inicialização: {e}")
+    
+    async def alert_integrity_failure(self):
+        """Avisar a staff no canal de logs sobre falha de integridade"""
+        await self.wait_until_ready()
+        log_channel = self.get_channel(Config.LOG_CHANNEL_ID)
+        if not log_channel:
+            return
         
-        # Verificar integridade
-        self.backup_manager.verify_integrity()
-        
-        # Criar backup inicial
-        logger.info("💾 Criando backup inicial...")
-        self.backup_manager.create_full_backup()
-        
+        try:
+            await log_channel.send(embed=discord.Embed(
+                title="🚨 Falha de Integridade do Banco",
+                description="`PRAGMA quick_check` encontrou problemas no banco de dados. Verifique os logs e os backups.",
+                color=Config.COLORS['error']
+            ))
+        except Exception as e:
+            logger.error(f"Erro ao enviar alerta de integridade: {e}")
+    
+    def create_http_session(self):
+        """Sessão HTTP compartilhada para chamadas REST (OAuth2, pull de membros)"""
+        connector = aiohttp.TCPConnector(
+            limit=int(os.getenv('HTTP_POOL_SIZE', '100')),
+            limit_per_host=int(os.getenv('HTTP_POOL_PER_HOST', '50')),
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=float(os.getenv('HTTP_TIMEOUT', '30')),
+            connect=10
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            trace_configs=[http_trace_config()]
+        )
+    
+    def record_startup(self, phase, started):
+        """Registrar uma fase da inicialização iniciada em ``started`` (perf_counter)"""
+        duration = time.perf_counter() - started
+        self.startup_timeline.append({
+            'phase': phase,
+            'start': round(started - self._boot_clock, 3),
+            'duration': round(duration, 3)
+        })
+        return duration
+    
+    async def load_extensions(self, extensions):
+        """Carregar extensões uma a uma, medindo o tempo de cada uma"""
+        # Import e __init__ dos cogs são síncronos: carregar em paralelo não
+        # ganharia tempo e misturaria as durações na linha do tempo
+        for ext in extensions:
+            started = time.perf_counter()
+            try:
+                await self.load_extension(ext)
+                duration = self.record_startup(ext, started)
+                logger.info(f"✅ {ext} carregado ({duration:.2f}s)")
+            except Exception as e:
+                logger.error(f"❌ Erro ao carregar {ext}: {e}")
+    
     async def setup_hook(self):
         """Carregar cogs e inicializar componentes"""
+        setup_started = time.perf_counter()
+        
+        # Cliente HTTP reutilizado por todos os módulos (keep-alive + cache DNS)
+        self.http_session = self.create_http_session()
+        
+        # Gravação em lote de logs e estatísticas
+        self.db.start_flusher()
+        
+        # Atraso e bloqueios do event loop (logs + /metrics)
+        self.loop_monitor.start()
+        
+        started = time.perf_counter()
+        await self.prepare_data()
+        self.record_startup('prepare_data', started)
+        
         logger.info("🔄 Carregando extensões...")
         
         extensions = [
@@ -73,43 +197,43 @@ class PandaBot(commands.Bot):
             'cogs.products'
         ]
         
-        for ext in extensions:
-            try:
-                await self.load_extension(ext)
-                logger.info(f"✅ {ext} carregado")
-            except Exception as e:
-                logger.error(f"❌ Erro ao carregar {ext}: {e}")
+        started = time.perf_counter()
+        await self.load_extensions(extensions)
+        self.record_startup('extensions', started)
         
         # Iniciar servidor web
         self.web_server = WebServer(self)
         asyncio.create_task(self.web_server.start())
         
+        # Renovação proativa de tokens OAuth2
+        started = time.perf_counter()
+        await self.token_refresher.start()
+        self.record_startup('token_refresher', started)
+        
+        # Integridade e backup inicial sem atrasar a conexão ao gateway
+        self.startup_task = asyncio.create_task(self.startup_maintenance())
+        
         # Iniciar tarefas de background
         self.background_tasks.start()
         self.snapshot_backup.start()
         self.hourly_backup.start()
         
-        logger.info("✅ Setup concluído!")
+        duration = self.record_startup('setup_hook', setup_started)
+        logger.info(f"✅ Setup concluído em {duration:.2f}s!")
     
     @tasks.loop(minutes=30)
     async def background_tasks(self):
         """Tarefas periódicas a cada 30 minutos"""
         try:
-            # Verificar e renovar tokens OAuth2 expirados
-            expired = self.db.get_expired_tokens()
-            if expired:
-                logger.info(f"🔄 Renovando {len(expired)} tokens expirados...")
-                oauth_cog = self.get_cog('OAuth')
-                if oauth_cog:
-                    for user_data in expired:
-                        try:
-                            await oauth_cog.refresh_token(user_data['user_id'])
-                        except Exception as e:
-                            logger.error(f"Erro ao renovar token para {user_data['user_id']}: {e}")
+            # Retenção das transcrições de tickets
+            await self.transcript_store.prune()
             
             # Log de status
-            stats = self.db.get_stats()
-            logger.info(f"📊 Status: {stats['total_users']} OAuth2 | {len(self.guilds)} servidores | {len(self.users)} usuários")
+            stats = await self.db.get_stats()
+            logger.info(f"📊 Status: {stats['total_users']} OAuth2 | {len(self.guilds)} servidores | {len(self.users)} usuários | {self.token_refresher.pending} tokens agendados")
+            
+            usage = await self.transcript_store.usage()
+            logger.info(f"🗜️ Transcrições: {usage['blobs']} arquivos | {usage['size'] / 1024 ** 2:.1f} MB → {usage['stored_size'] / 1024 ** 2:.1f} MB comprimidos")
                 
         except Exception as e:
             logger.error(f"Erro nas tarefas de background: {e}")
@@ -118,7 +242,7 @@ class PandaBot(commands.Bot):
     async def snapshot_backup(self):
         """Criar snapshot JSON a cada 10 minutos - CRÍTICO PARA PERSISTÊNCIA"""
         try:
-            self.backup_manager.create_oauth_snapshot()
+            await self.backup_manager.create_oauth_snapshot()
             logger.info("💾 Snapshot OAuth2 atualizado")
         except Exception as e:
             logger.error(f"❌ Erro no snapshot automático: {e}")
@@ -127,7 +251,7 @@ class PandaBot(commands.Bot):
     async def hourly_backup(self):
         """Backup completo a cada 6 horas"""
         try:
-            backup_path = self.backup_manager.create_full_backup()
+            backup_path = await self.backup_manager.create_full_backup()
             if backup_path:
                 logger.info(f"💾 Backup completo criado: {backup_path}")
             else:
@@ -148,32 +272,52 @@ class PandaBot(commands.Bot):
         await self.wait_until_ready()
     
     async def on_ready(self):
+        """Disparado a cada conexão (inclusive reconexões): só a primeira faz o trabalho pesado"""
+        if self.startup_runs == 0:
+            self.startup_runs += 1
+            await self.on_startup()
+        else:
+            self.reconnect_runs += 1
+            await self.on_reconnect()
+    
+    async def on_resumed(self):
+        self.resume_count += 1
+        logger.info(f"🔁 Sessão retomada (resumes: {self.resume_count})")
+    
+    async def on_reconnect(self):
+        """Reconexão ao gateway: apenas atualizar o status"""
+        logger.info(
+            f"🔁 Reconectado ao gateway (reconexões: {self.reconnect_runs}, "
+            f"resumes: {self.resume_count}) - {len(self.guilds)} servidores"
+        )
+        await self.update_presence()
+    
+    async def on_startup(self):
+        """Fase única de inicialização, na primeira conexão"""
+        self.ready_after = round(time.perf_counter() - self._boot_clock, 3)
+        self.log_startup_timeline()
+        
         logger.info(f"✅ Bot online como {self.user.name}#{self.user.discriminator}")
         logger.info(f"📊 Conectado em {len(self.guilds)} servidores")
         logger.info(f"👥 Servindo {len(self.users)} usuários")
         
         # Estatísticas do banco
-        stats = self.db.get_stats()
+        stats = await self.db.get_stats()
         logger.info(f"🔐 {stats['total_users']} usuários com OAuth2")
         logger.info(f"🎫 {stats['total_tickets']} tickets registrados")
         logger.info(f"🚫 {stats['total_blacklisted']} usuários na blacklist")
         
-        # Verificar integridade dos dados OAuth2
-        oauth_users = self.db.get_all_oauth_users()
-        logger.info(f"✅ Verificação: {len(oauth_users)} registros OAuth2 carregados do banco")
-        
         # Criar snapshot imediato após inicialização
-        self.backup_manager.create_oauth_snapshot()
+        await self.backup_manager.create_oauth_snapshot()
         logger.info("💾 Snapshot inicial criado após inicialização")
         
-        # Sincronizar comandos slash
-        try:
-            synced = await self.tree.sync()
-            logger.info(f"✅ {len(synced)} comandos slash sincronizados")
-        except Exception as e:
-            logger.error(f"Erro ao sincronizar comandos: {e}")
+        # Sincronizar comandos slash (somente se a árvore mudou)
+        await self.sync_commands()
         
-        # Status do bot
+        await self.update_presence()
+    
+    async def update_presence(self):
+        """Status do bot"""
         await self.change_presence(
             activity=discord.Activity(
                 type=discord.ActivityType.watching,
@@ -182,6 +326,39 @@ class PandaBot(commands.Bot):
             status=discord.Status.online
         )
     
+    def command_tree_hash(self):
+        """Hash da árvore de comandos local (nomes, opções, descrições)"""
+        payload = sorted(
+            (command.to_dict(self.tree) for command in self.tree.get_commands()),
+            key=lambda c: (c.get('type', 1), c['name'])
+        )
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+    
+    async def sync_commands(self):
+        """Sincronizar comandos slash apenas quando a árvore local mudar"""
+        try:
+            tree_hash = self.command_tree_hash()
+            force = os.getenv('FORCE_COMMAND_SYNC', '').lower() in ('1', 'true', 'yes')
+            
+            if not force and await self.db.get_meta('command_tree_hash') == tree_hash:
+                logger.info(f"⏭️ Comandos slash inalterados ({tree_hash[:12]}), sincronização ignorada")
+                return False
+            
+            synced = await self.tree.sync()
+            await self.db.set_meta('command_tree_hash', tree_hash)
+            logger.info(f"✅ {len(synced)} comandos slash sincronizados ({tree_hash[:12]})")
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao sincronizar comandos: {e}")
+            return False
+    
+    def log_startup_timeline(self):
+        """Resumo da inicialização nos logs"""
+        logger.info(f"⏱️ Pronto em {self.ready_after:.2f}s após iniciar")
+        for entry in sorted(self.startup_timeline, key=lambda e: e['start']):
+            logger.info(f"⏱️   +{entry['start']:.2f}s {entry['phase']}: {entry['duration']:.2f}s")
+    
     async def on_command_error(self, ctx, error):
         """Tratamento de erros"""
         if isinstance(error, commands.CommandNotFound):
@@ -207,23 +384,38 @@ class PandaBot(commands.Bot):
                 color=Config.COLORS['error']
             ))
     
-    async def close(self):
-        """Fechar bot e salvar dados"""
-        logger.info("🔄 Encerrando bot...")
+    async def save_and_close_data(self):
+        """Backup final e fechamento do banco"""
+        if self.db.closed:
+            return
+        
+        # Gravar logs e estatísticas pendentes no buffer
+        await self.db.flush()
         
         # ✅ BACKUP FINAL CRÍTICO antes de fechar
         logger.info("💾 Criando backup final CRÍTICO...")
-        self.backup_manager.create_full_backup()
+        await self.backup_manager.create_full_backup()
         
         # Garantir que snapshot está atualizado
-        self.backup_manager.create_oauth_snapshot()
-        
-        # Forçar commit final
-        self.db.conn.commit()
+        await self.backup_manager.create_oauth_snapshot()
         logger.info("✅ Dados salvos com sucesso")
         
         # Fechar banco de dados
-        self.db.close()
+        await self.db.close()
+    
+    async def close(self):
+        """Fechar bot e salvar dados"""
+        logger.info("🔄 Encerrando bot...")
+        
+        await self.token_refresher.stop()
+        
+        self.loop_monitor.stop()
+        
+        await self.save_and_close_data()
+        
+        # Fechar sessão HTTP compartilhada
+        if self.http_session and not self.http_session.closed:
+            await self.http_session.close()
         
         # Fechar bot
         await super().close()
@@ -260,13 +452,9 @@ def main():
     finally:
         # Garantir que o banco seja fechado corretamente
         try:
-            if hasattr(bot, 'backup_manager'):
+            if hasattr(bot, 'db') and not bot.db.closed:
                 logger.info("💾 Salvando dados finais...")
-                bot.backup_manager.create_full_backup()
-                bot.backup_manager.create_oauth_snapshot()
-            if hasattr(bot, 'db'):
-                bot.db.conn.commit()
-                bot.db.close()
+                asyncio.run(bot.save_and_close_data())
         except Exception as e:
             logger.error(f"Erro ao fechar banco: {e}")
 
@@ -0,0 +1,237 @@
+import logging
+import re
+import time
+from contextlib import contextmanager
+
+import aiohttp
+
+logger = logging.getLogger('PandaBot.Metrics')
+
+# Buckets em segundos, de 1ms a 30s
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.kind}"
+        ]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Contador monotônico"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Valor instantâneo"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def _samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Distribuição de durações em buckets cumulativos"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # labels -> [contagem por bucket, soma, total]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][i] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Medir a duração do bloco ``with``"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    """Conjunto de métricas exportadas em /metrics (formato texto do Prometheus)"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+INTERACTION_LATENCY = registry.histogram(
+    'pandabot_interaction_seconds', 'Tempo de execução dos comandos slash', ('command',)
+)
+INTERACTION_ERRORS = registry.counter(
+    'pandabot_interaction_errors_total', 'Comandos slash que terminaram em erro', ('command',)
+)
+DB_QUERY_LATENCY = registry.histogram(
+    'pandabot_db_query_seconds', 'Duração das operações do Database, incluindo a espera na fila', ('method', 'kind')
+)
+REST_LATENCY = registry.histogram(
+    'pandabot_rest_request_seconds', 'Latência das requisições REST', ('method', 'route')
+)
+REST_RESPONSES = registry.counter(
+    'pandabot_rest_responses_total', 'Respostas REST por status', ('method', 'route', 'status')
+)
+REST_RATE_LIMITED = registry.counter(
+    'pandabot_rest_rate_limited_total', 'Respostas 429 recebidas', ('method', 'route')
+)
+PULL_RESULTS = registry.counter(
+    'pandabot_pull_results_total', 'Resultados do pull de membros OAuth2', ('source', 'result')
+)
+STRIPE_WEBHOOK_LATENCY = registry.histogram(
+    'pandabot_stripe_webhook_seconds', 'Tempo de processamento do webhook do Stripe', ('event_type',)
+)
+LOOP_LAG = registry.histogram(
+    'pandabot_event_loop_lag_seconds', 'Atraso de agendamento do event loop',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_STALLS = registry.counter(
+    'pandabot_event_loop_stalls_total', 'Bloqueios do event loop acima do limite, por corrotina', ('coroutine',)
+)
+
+# IDs (snowflakes) e tokens viram placeholders para limitar a cardinalidade
+_ROUTE_PLACEHOLDERS = (
+    (re.compile(r'/\d{15,}'), '/{id}'),
+    (re.compile(r'/(interactions|webhooks)/\{id\}/[^/]+'), r'/\1/{id}/{token}'),
+)
+
+
+def rest_route(url):
+    """Rota normalizada (host + caminho sem IDs) usada como label"""
+    path = url.path
+    for pattern, replacement in _ROUTE_PLACEHOLDERS:
+        path = pattern.sub(replacement, path)
+    return f"{url.host}{path}"
+
+
+def http_trace_config():
+    """TraceConfig do aiohttp que mede latência, status e 429 de cada requisição"""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        route = rest_route(params.url)
+        status = params.response.status
+        REST_LATENCY.observe(time.perf_counter() - context.started, method=params.method, route=route)
+        REST_RESPONSES.inc(method=params.method, route=route, status=status)
+        if status == 429:
+            REST_RATE_LIMITED.inc(method=params.method, route=route)
+
+    async def on_request_exception(session, context, params):
+        route = rest_route(params.url)
+        REST_LATENCY.observe(time.perf_counter() - context.started, method=params.method, route=route)
+        REST_RESPONSES.inc(method=params.method, route=route, status='error')
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
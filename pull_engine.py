@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+import time
+
+from metrics import PULL_RESULTS
+
+logger = logging.getLogger('PandaBot.PullEngine')
+
+API_ENDPOINT = 'https://discord.com/api/v10'
+
+
+class RateLimiter:
+    """Controle dos buckets de rate limit da API do Discord.
+
+    Cada rota é mapeada para o bucket informado em ``X-RateLimit-Bucket``.
+    Quando um bucket esgota (``remaining == 0``) as próximas requisições
+    esperam até o reset; um 429 global pausa todas as rotas.
+    """
+
+    def __init__(self):
+        self._route_buckets = {}
+        self._buckets = {}
+        self._locks = {}
+        self._global_reset_at = 0.0
+
+    def _bucket_key(self, route):
+        return self._route_buckets.get(route, route)
+
+    async def acquire(self, route):
+        """Esperar até a rota poder ser usada"""
+        key = self._bucket_key(route)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            now = time.monotonic()
+            if self._global_reset_at > now:
+                await asyncio.sleep(self._global_reset_at - now)
+
+            remaining, reset_at = self._buckets.get(key, (1, 0.0))
+            now = time.monotonic()
+            if remaining <= 0 and reset_at > now:
+                await asyncio.sleep(reset_at - now)
+                remaining = 1
+
+            # Reservar uma requisição até a resposta atualizar o bucket
+            self._buckets[key] = (remaining - 1, reset_at)
+
+    def update(self, route, headers):
+        """Atualizar o bucket da rota a partir dos headers da resposta"""
+        bucket = headers.get('X-RateLimit-Bucket')
+        if bucket:
+            self._route_buckets[route] = bucket
+        key = self._bucket_key(route)
+
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After')
+        if remaining is not None and reset_after is not None:
+            self._buckets[key] = (int(remaining), time.monotonic() + float(reset_after))
+
+    def rate_limited(self, route, retry_after, is_global):
+        """Registrar um 429"""
+        reset_at = time.monotonic() + retry_after
+        if is_global:
+            self._global_reset_at = max(self._global_reset_at, reset_at)
+        else:
+            self._buckets[self._bucket_key(route)] = (0, reset_at)
+
+
+class PullResult:
+    """Contadores de uma execução de pull"""
+
+    def __init__(self, total):
+        self.total = total
+        self.pulled = 0
+        self.already_member = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def done(self):
+        return self.pulled + self.already_member + self.failed
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+
+class PullEngine:
+    """Puxa usuários OAuth2 para o servidor com um pool de workers.
+
+    Membros que já estão no cache do servidor são pulados sem nenhuma
+    chamada à API; os demais são distribuídos entre ``workers`` tarefas
+    que respeitam os buckets de rate limit do Discord.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, bot, workers=None):
+        self.bot = bot
+        self.workers = workers or int(os.getenv('PULL_WORKERS', '5'))
+        self.rate_limiter = RateLimiter()
+
+    async def pull(self, guild, oauth_users, progress_callback=None, progress_interval=3.0):
+        """Puxar ``oauth_users`` para ``guild`` e retornar um PullResult"""
+        oauth_cog = self.bot.get_cog('OAuth')
+        result = PullResult(len(oauth_users))
+        queue = asyncio.Queue()
+
+        for user_data in oauth_users:
+            # Já está no servidor: nada a fazer
+            if guild.get_member(int(user_data['user_id'])):
+                result.already_member += 1
+            else:
+                queue.put_nowait(user_data)
+
+        if queue.empty():
+            PULL_RESULTS.inc(result.already_member, source='command', result='already_member')
+            return result
+
+        logger.info(f"🔄 Puxando {queue.qsize()} usuários com {self.workers} workers...")
+
+        session = self.bot.http_session
+        workers = [
+            asyncio.create_task(self._worker(session, guild, oauth_cog, queue, result))
+            for _ in range(min(self.workers, queue.qsize()))
+        ]
+        reporter = None
+        if progress_callback:
+            reporter = asyncio.create_task(
+                self._report_progress(result, progress_callback, progress_interval)
+            )
+
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            if reporter:
+                reporter.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        PULL_RESULTS.inc(result.pulled, source='command', result='pulled')
+        PULL_RESULTS.inc(result.already_member, source='command', result='already_member')
+        PULL_RESULTS.inc(result.failed, source='command', result='failed')
+
+        logger.info(
+            f"✅ Pull concluído em {result.elapsed:.1f}s: {result.pulled} puxados, "
+            f"{result.already_member} já no servidor, {result.failed} falhas"
+        )
+        return result
+
+    async def _report_progress(self, result, progress_callback, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await progress_callback(result)
+            except Exception as e:
+                logger.warning(f"Erro ao atualizar progresso do pull: {e}")
+
+    async def _worker(self, session, guild, oauth_cog, queue, result):
+        while True:
+            user_data = await queue.get()
+            try:
+                await self._pull_one(session, guild, oauth_cog, user_data, result)
+            except Exception as e:
+                result.failed += 1
+                logger.error(f"Erro ao puxar usuário {user_data['user_id']}: {e}")
+            finally:
+                queue.task_done()
+
+    async def _pull_one(self, session, guild, oauth_cog, user_data, result):
+        uid = user_data['user_id']
+
+        access_token = await oauth_cog.ensure_valid_token(uid, user_data) if oauth_cog else user_data['access_token']
+        if not access_token:
+            logger.error(f"❌ Token inválido para {uid}, não foi possível renovar")
+            result.failed += 1
+            await self.bot.db.increment_stat('failed_pulls')
+            return
+
+        status = await self.add_member(session, guild.id, uid, access_token)
+
+        if status in (200, 201):
+            result.pulled += 1
+            await self.bot.db.update_last_pulled(uid)
+            await self.bot.db.increment_stat('successful_pulls')
+            logger.info(f"✅ {uid} puxado com sucesso!")
+        elif status == 204:
+            result.already_member += 1
+        else:
+            result.failed += 1
+            await self.bot.db.increment_stat('failed_pulls')
+
+    async def add_member(self, session, guild_id, user_id, access_token):
+        """PUT /guilds/{guild}/members/{user} respeitando o rate limit. Retorna o status HTTP"""
+        route = f'PUT /guilds/{guild_id}/members'
+        headers = {
+            'Authorization': f'Bot {self.bot.http.token}',
+            'Content-Type': 'application/json'
+        }
+
+        for attempt in range(self.MAX_ATTEMPTS):
+            await self.rate_limiter.acquire(route)
+
+            async with session.put(
+                f'{API_ENDPOINT}/guilds/{guild_id}/members/{user_id}',
+                headers=headers,
+                json={'access_token': access_token}
+            ) as resp:
+                self.rate_limiter.update(route, resp.headers)
+
+                if resp.status == 429:
+                    data = await resp.json(content_type=None)
+                    retry_after = float(data.get('retry_after', 1))
+                    self.rate_limiter.rate_limited(route, retry_after, data.get('global', False))
+                    logger.warning(f"⏳ Rate limit ao puxar {user_id}, tentando novamente em {retry_after:.1f}s")
+                    continue
+
+                if resp.status not in (200, 201, 204):
+                    error_text = await resp.text()
+                    logger.error(f"❌ Erro ao puxar {user_id}: {resp.status} - {error_text}")
+
+                return resp.status
+
+        return 429
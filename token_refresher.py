@@ -0,0 +1,161 @@
+import asyncio
+import heapq
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger('PandaBot.TokenRefresher')
+
+
+class TokenRefreshScheduler:
+    """Renovação proativa de tokens OAuth2.
+
+    Mantém um min-heap de ``(refresh_at, user_id)`` e dorme até a próxima
+    renovação devida, em vez de varrer o banco periodicamente. Tokens
+    vencendo juntos são renovados em lotes com paralelismo limitado e um
+    pequeno jitter para não concentrar as chamadas.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.refresh_margin = int(os.getenv('TOKEN_REFRESH_MARGIN', '86400'))
+        self.concurrency = int(os.getenv('TOKEN_REFRESH_CONCURRENCY', '5'))
+        self.batch_size = int(os.getenv('TOKEN_REFRESH_BATCH', '50'))
+        self.jitter = float(os.getenv('TOKEN_REFRESH_JITTER', '5'))
+        self.retry_delay = int(os.getenv('TOKEN_REFRESH_RETRY', '900'))
+        self.max_failures = 3
+
+        self._heap = []
+        self._scheduled = {}
+        self._failures = {}
+        self._wakeup = None
+        self._task = None
+
+    async def start(self):
+        """Carregar as expirações do banco e iniciar o agendador"""
+        self._wakeup = asyncio.Event()
+        for user_data in await self.bot.db.get_all_oauth_users():
+            self.schedule(user_data['user_id'], user_data['expires_at'])
+
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"⏰ Agendador de tokens iniciado com {len(self._scheduled)} tokens")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, user_id, expires_at):
+        """Agendar (ou reagendar) a renovação de um token"""
+        self._scheduled[user_id] = expires_at
+        self._failures.pop(user_id, None)
+        self._push(expires_at - self.refresh_margin, user_id)
+
+    def unschedule(self, user_id):
+        # Entradas antigas no heap são descartadas ao sair
+        self._scheduled.pop(user_id, None)
+        self._failures.pop(user_id, None)
+
+    @property
+    def pending(self):
+        return len(self._scheduled)
+
+    def _push(self, refresh_at, user_id):
+        was_next = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (refresh_at, user_id))
+        if self._wakeup and (was_next is None or refresh_at < was_next):
+            self._wakeup.set()
+
+    def _pop_due(self, now):
+        """Retirar do heap até ``batch_size`` usuários com renovação vencida"""
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            refresh_at, user_id = heapq.heappop(self._heap)
+            expires_at = self._scheduled.get(user_id)
+            if expires_at is None:
+                continue
+
+            # Entrada obsoleta: o token já foi reagendado com outra expiração
+            if user_id in self._failures:
+                current = self._failures[user_id][1]
+            else:
+                current = expires_at - self.refresh_margin
+            if refresh_at != current:
+                continue
+
+            due.append(user_id)
+        return due
+
+    async def _run(self):
+        while True:
+            try:
+                now = time.time()
+                if not self._heap:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                next_at = self._heap[0][0]
+                if next_at > now:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=next_at - now)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                due = self._pop_due(now)
+                if due:
+                    await self._refresh_batch(due)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro no agendador de tokens: {e}")
+                await asyncio.sleep(60)
+
+    async def _refresh_batch(self, user_ids):
+        oauth_cog = self.bot.get_cog('OAuth')
+        if not oauth_cog:
+            for user_id in user_ids:
+                self._retry(user_id)
+            return
+
+        logger.info(f"🔄 Renovando {len(user_ids)} tokens...")
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def refresh(user_id):
+            async with semaphore:
+                await asyncio.sleep(random.uniform(0, self.jitter))
+                if user_id not in self._scheduled:
+                    return
+                try:
+                    # refresh_token reagenda o usuário com a nova expiração
+                    new_token = await oauth_cog.refresh_token(user_id)
+                except Exception as e:
+                    logger.error(f"Erro ao renovar token para {user_id}: {e}")
+                    new_token = None
+                if not new_token:
+                    self._retry(user_id)
+
+        await asyncio.gather(*(refresh(user_id) for user_id in user_ids))
+
+    def _retry(self, user_id):
+        if user_id not in self._scheduled:
+            return
+
+        failures = self._failures.get(user_id, (0, None))[0] + 1
+        if failures >= self.max_failures:
+            logger.warning(f"⚠️ Renovação de {user_id} falhou {failures} vezes, aguardando nova autorização")
+            self._failures.pop(user_id, None)
+            self._scheduled.pop(user_id, None)
+            return
+
+        retry_at = time.time() + self.retry_delay
+        self._failures[user_id] = (failures, retry_at)
+        self._push(retry_at, user_id)
@@ -0,0 +1,101 @@
+import os
+import gzip
+import hashlib
+import logging
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+logger = logging.getLogger('PandaBot.TranscriptStore')
+
+class TranscriptStore:
+    """Armazenamento de transcrições comprimidas e endereçadas por conteúdo"""
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, db):
+        self.db = db
+        self.base_dir = Path('data') / 'transcripts'
+        self.retention_days = int(os.getenv('TRANSCRIPT_RETENTION_DAYS', '90'))
+
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+
+    def _blob_path(self, blob_hash):
+        return self.base_dir / blob_hash[:2] / f"{blob_hash}.gz"
+
+    def _compress(self, source_path):
+        """Comprimir o arquivo e calcular o hash em uma única leitura"""
+        digest = hashlib.sha256()
+        tmp_path = self.base_dir / f".{Path(source_path).name}.tmp"
+        size = 0
+
+        with open(source_path, 'rb') as src, open(tmp_path, 'wb') as raw:
+            # mtime=0: o mesmo conteúdo gera sempre os mesmos bytes
+            with gzip.GzipFile(filename='', mode='wb', fileobj=raw, mtime=0) as gz:
+                while True:
+                    chunk = src.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    gz.write(chunk)
+                    size += len(chunk)
+
+        blob_hash = digest.hexdigest()
+        blob_path = self._blob_path(blob_hash)
+
+        if blob_path.exists():
+            # Conteúdo duplicado (ex.: o mesmo ticket gerado de novo ao
+            # repetir o fechamento): reaproveitar o blob existente
+            tmp_path.unlink()
+        else:
+            blob_path.parent.mkdir(exist_ok=True)
+            os.replace(tmp_path, blob_path)
+
+        os.remove(source_path)
+        return blob_hash, str(blob_path), size, blob_path.stat().st_size
+
+    async def store(self, channel_id, source_path):
+        """Guardar a transcrição de um ticket e remover o arquivo original"""
+        blob_hash, blob_path, size, stored_size = await asyncio.to_thread(self._compress, source_path)
+        filename = f"{Path(source_path).name}.gz"
+
+        await self.db.add_transcript(channel_id, blob_hash, blob_path, filename, size, stored_size)
+        logger.info(f"🗜️ Transcrição de {channel_id} armazenada: {size} → {stored_size} bytes ({blob_hash[:12]})")
+
+        return {
+            'channel_id': channel_id,
+            'hash': blob_hash,
+            'path': blob_path,
+            'filename': filename,
+            'size': size,
+            'stored_size': stored_size
+        }
+
+    async def read(self, transcript):
+        """Bytes comprimidos do blob, prontos para upload"""
+        return await asyncio.to_thread(Path(transcript['path']).read_bytes)
+
+    async def prune(self):
+        """Aplicar a política de retenção e apagar blobs sem referência"""
+        if self.retention_days <= 0:
+            return 0
+
+        threshold = int((datetime.utcnow() - timedelta(days=self.retention_days)).timestamp())
+        removed, orphan_paths = await self.db.prune_transcripts(threshold)
+
+        def delete_blobs():
+            for path in orphan_paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        await asyncio.to_thread(delete_blobs)
+
+        if removed:
+            logger.info(f"🗑️ {removed} transcrições expiradas, {len(orphan_paths)} blobs removidos")
+        return removed
+
+    async def usage(self):
+        """Total de blobs e bytes (original/comprimido) armazenados"""
+        return await self.db.get_transcript_usage()
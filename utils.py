@@ -2,6 +2,11 @@ import logging
 import discord
 from datetime import datetime
 import os
+import html
+import json
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 class Config:
@@ -15,6 +20,9 @@ class Config:
     RATING_CHANNEL_ID = int(os.getenv('RATING_CHANNEL_ID', '1149436350064492647'))
     TICKET_PANEL_CHANNEL_ID = int(os.getenv('TICKET_PANEL_CHANNEL_ID', '1192915049845637160'))
     
+    # Formato das transcrições de tickets (txt ou html)
+    TRANSCRIPT_FORMAT = os.getenv('TRANSCRIPT_FORMAT', 'txt')
+    
     # Cores
     COLORS = {
         'success': 0x00FF00,
@@ -272,45 +280,335 @@ class Views:
                 ephemeral=True
             )
 
+class TextTranscriptRenderer:
+    """Renderizador de transcrição em texto puro"""
+    
+    extension = 'txt'
+    
+    def header(self, channel: discord.TextChannel) -> str:
+        # Data de abertura, não da geração: o mesmo conteúdo gera os mesmos bytes
+        return (
+            f"Transcrição do Ticket: {channel.name}\n"
+            f"Aberto em: {Formatters.format_datetime(int(channel.created_at.timestamp()))}\n"
+            + "=" * 50 + "\n\n"
+        )
+    
+    def message(self, record: dict) -> str:
+        timestamp = datetime.fromtimestamp(record['created_at']).strftime("%d/%m/%Y %H:%M:%S")
+        content = record['content'] or "[Arquivo/Embed]"
+        
+        lines = [f"[{timestamp}] {record['author']}: {content}"]
+        
+        # Adicionar anexos
+        for attachment in record['attachments']:
+            lines.append(f"  └─ Anexo: {attachment['url']}")
+        
+        # Adicionar embeds
+        for title in record['embeds']:
+            lines.append(f"  └─ Embed: {title}")
+        
+        return "\n".join(lines) + "\n"
+    
+    def footer(self) -> str:
+        return ""
+
+class HtmlTranscriptRenderer:
+    """Renderizador de transcrição em HTML"""
+    
+    extension = 'html'
+    
+    def header(self, channel: discord.TextChannel) -> str:
+        title = html.escape(channel.name)
+        opened_at = Formatters.format_datetime(int(channel.created_at.timestamp()))
+        return (
+            "<!DOCTYPE html>\n<html lang=\"pt-BR\">\n<head>\n<meta charset=\"utf-8\">\n"
+            f"<title>Transcrição - {title}</title>\n"
+            "<style>"
+            "body{background:#313338;color:#dbdee1;font-family:sans-serif;margin:0;padding:20px}"
+            ".msg{padding:6px 0;border-bottom:1px solid #3f4147}"
+            ".author{font-weight:bold;color:#f2f3f5}"
+            ".time{color:#949ba4;font-size:12px;margin-left:8px}"
+            ".content{white-space:pre-wrap;margin-top:2px}"
+            ".extra{color:#949ba4;font-size:13px;margin-left:12px}"
+            "a{color:#00a8fc}"
+            "</style>\n</head>\n<body>\n"
+            f"<h2>Transcrição do Ticket: {title}</h2>\n"
+            f"<p>Aberto em: {opened_at}</p>\n"
+        )
+    
+    def message(self, record: dict) -> str:
+        timestamp = datetime.fromtimestamp(record['created_at']).strftime("%d/%m/%Y %H:%M:%S")
+        author = html.escape(record['author'])
+        content = html.escape(record['content']) if record['content'] else "<i>[Arquivo/Embed]</i>"
+        
+        parts = [
+            '<div class="msg">',
+            f'<span class="author">{author}</span><span class="time">{timestamp}</span>',
+            f'<div class="content">{content}</div>'
+        ]
+        
+        for attachment in record['attachments']:
+            url = html.escape(attachment['url'], quote=True)
+            filename = html.escape(attachment['filename'])
+            parts.append(f'<div class="extra">📎 <a href="{url}">{filename}</a></div>')
+        
+        for title in record['embeds']:
+            parts.append(f'<div class="extra">Embed: {html.escape(title)}</div>')
+        
+        parts.append('</div>')
+        return "\n".join(parts) + "\n"
+    
+    def footer(self) -> str:
+        return "</body>\n</html>\n"
+
 class TranscriptGenerator:
     """Gerador de transcrições de tickets"""
     
+    RENDERERS = {
+        'txt': TextTranscriptRenderer,
+        'html': HtmlTranscriptRenderer
+    }
+    
+    # Mensagens por escrita em disco (uma página da API de histórico)
+    PAGE_SIZE = 100
+    
     @staticmethod
-    async def generate(channel: discord.TextChannel) -> str:
-        """Gerar transcrição do canal"""
-        messages = []
-        
-        async for message in channel.history(limit=None, oldest_first=True):
-            timestamp = message.created_at.strftime("%d/%m/%Y %H:%M:%S")
-            author = f"{message.author.name}#{message.author.discriminator}"
-            content = message.content or "[Arquivo/Embed]"
+    def record(message: discord.Message) -> dict:
+        """Converter uma mensagem no registro usado pelos renderizadores"""
+        return {
+            'id': message.id,
+            'created_at': message.created_at.timestamp(),
+            'author': f"{message.author.name}#{message.author.discriminator}",
+            'content': message.content,
+            'attachments': [{'url': a.url, 'filename': a.filename} for a in message.attachments],
+            'embeds': [embed.title for embed in message.embeds if embed.title]
+        }
+    
+    @staticmethod
+    def _renderer(fmt: Optional[str] = None):
+        return TranscriptGenerator.RENDERERS.get(fmt or Config.TRANSCRIPT_FORMAT, TextTranscriptRenderer)()
+    
+    @staticmethod
+    def _output_path(channel: discord.TextChannel, renderer) -> str:
+        filename = f"transcript_{channel.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{renderer.extension}"
+        return f"data/{filename}"
+    
+    @staticmethod
+    async def generate(channel: discord.TextChannel, fmt: Optional[str] = None) -> str:
+        """Gerar transcrição do canal, gravando cada página do histórico conforme chega"""
+        renderer = TranscriptGenerator._renderer(fmt)
+        filepath = TranscriptGenerator._output_path(channel, renderer)
+        
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(renderer.header(channel))
             
-            messages.append(f"[{timestamp}] {author}: {content}")
+            page = []
+            async for message in channel.history(limit=None, oldest_first=True):
+                page.append(renderer.message(TranscriptGenerator.record(message)))
+                
+                if len(page) >= TranscriptGenerator.PAGE_SIZE:
+                    await asyncio.to_thread(f.write, "".join(page))
+                    page = []
             
-            # Adicionar anexos
-            if message.attachments:
-                for attachment in message.attachments:
-                    messages.append(f"  └─ Anexo: {attachment.url}")
+            page.append(renderer.footer())
+            await asyncio.to_thread(f.write, "".join(page))
+        
+        return filepath
+
+class TranscriptRecorder:
+    """Captura incremental das mensagens de tickets abertos.
+    
+    Cada ticket tem um log JSONL (uma mensagem por linha, edições como
+    novas linhas) gravado conforme as mensagens chegam. Ao fechar, o log
+    é apenas renderizado, sem buscar o histórico inteiro no Discord; só
+    lacunas de captura (reinício, reconexão) são buscadas na API.
+    
+    Todo acesso aos arquivos passa por uma única thread, na ordem em que
+    os eventos chegam, para não bloquear o event loop.
+    """
+    
+    def __init__(self, base_dir: str = 'data/transcripts/live'):
+        self.base_dir = base_dir
+        # Marca de sincronização por canal: todo o histórico até este ID já
+        # está no log
+        self.synced_ids = {}
+        # Canais capturados sem lacuna desde a marca; só nesses as mensagens
+        # ao vivo avançam a marca
+        self.live_channels = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='PandaBot-Transcripts')
+        os.makedirs(base_dir, exist_ok=True)
+    
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+    
+    def _path(self, channel_id) -> str:
+        return os.path.join(self.base_dir, f"{channel_id}.jsonl")
+    
+    def has_log(self, channel_id) -> bool:
+        return os.path.exists(self._path(channel_id))
+    
+    def _append(self, channel_id, entries):
+        with open(self._path(channel_id), 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    
+    def _synced_id(self, channel_id) -> int:
+        """Marca de sincronização (lida do log após reinício)"""
+        if channel_id not in self.synced_ids:
+            synced_id = 0
+            if self.has_log(channel_id):
+                with open(self._path(channel_id), encoding='utf-8') as f:
+                    for line in f:
+                        synced_id = max(synced_id, json.loads(line).get('synced', 0))
+            self.synced_ids[channel_id] = synced_id
+        return self.synced_ids[channel_id]
+    
+    def _mark_synced(self, channel_id, message_id):
+        self._append(channel_id, [{'synced': message_id}])
+        self.synced_ids[channel_id] = message_id
+    
+    def _append_live(self, channel_id, entry):
+        self._append(channel_id, [entry])
+        if 'synced' in entry:
+            self.synced_ids[channel_id] = entry['synced']
+    
+    async def start(self, channel: discord.TextChannel):
+        """Iniciar o log de um ticket recém-criado (chamar antes de registrá-lo no banco)"""
+        # O ID do canal é anterior a qualquer mensagem nele: nada a buscar
+        self.live_channels.add(channel.id)
+        await self._run(self._mark_synced, channel.id, channel.id)
+    
+    def pause(self):
+        """Marcar a captura como interrompida (ex.: gateway desconectado)"""
+        self.live_channels.clear()
+    
+    async def add(self, message: discord.Message):
+        """Registrar uma nova mensagem"""
+        entry = TranscriptGenerator.record(message)
+        if message.channel.id in self.live_channels:
+            entry['synced'] = message.id
+        await self._run(self._append_live, message.channel.id, entry)
+    
+    async def edit(self, message: discord.Message):
+        """Registrar a edição de uma mensagem já capturada"""
+        entry = TranscriptGenerator.record(message)
+        entry['edited'] = True
+        await self._run(self._append, message.channel.id, [entry])
+    
+    async def catch_up(self, channel: discord.TextChannel) -> int:
+        """Buscar mensagens enviadas enquanto o bot não estava capturando"""
+        synced_id = await self._run(self._synced_id, channel.id)
+        after = discord.Object(id=synced_id) if synced_id else None
+        
+        # Mensagens já capturadas ao vivo voltam duplicadas; o render
+        # mantém uma por ID
+        count = 0
+        last_id = synced_id
+        page = []
+        async for message in channel.history(limit=None, after=after, oldest_first=True):
+            page.append(TranscriptGenerator.record(message))
+            last_id = message.id
+            count += 1
             
-            # Adicionar embeds
-            if message.embeds:
-                for embed in message.embeds:
-                    if embed.title:
-                        messages.append(f"  └─ Embed: {embed.title}")
+            if len(page) >= TranscriptGenerator.PAGE_SIZE:
+                await self._run(self._append, channel.id, page)
+                page = []
+        
+        if page:
+            await self._run(self._append, channel.id, page)
+        if last_id != synced_id:
+            await self._run(self._mark_synced, channel.id, last_id)
         
-        transcript = "\n".join(messages)
+        self.live_channels.add(channel.id)
+        return count
+    
+    def _entries(self, log_path):
+        """Mensagens do log, na ordem em que foram gravadas"""
+        if not os.path.exists(log_path):
+            return
+        with open(log_path, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                if 'id' in entry:
+                    yield entry
+    
+    def _render(self, channel: discord.TextChannel, renderer, filepath: str):
+        log_path = self._path(channel.id)
         
-        # Salvar em arquivo
-        filename = f"transcript_{channel.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-        filepath = f"data/{filename}"
+        # 1ª passada: quase todas as linhas chegam em ordem de ID; só as fora
+        # de ordem (edições, histórico buscado após mensagens ao vivo) ficam
+        # em memória, a última de cada ID vencendo
+        overrides = {}
+        last_id = 0
+        for entry in self._entries(log_path):
+            if entry['id'] > last_id:
+                last_id = entry['id']
+            else:
+                overrides[entry['id']] = entry
+        pending = sorted(overrides)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"Transcrição do Ticket: {channel.name}\n")
-            f.write(f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
-            f.write("=" * 50 + "\n\n")
-            f.write(transcript)
+        # 2ª passada: intercalar as linhas em ordem com as sobrescritas
+        index = 0
+        last_id = 0
+        with open(filepath, 'w', encoding='utf-8') as out:
+            out.write(renderer.header(channel))
+            for entry in self._entries(log_path):
+                message_id = entry['id']
+                if message_id <= last_id:
+                    continue
+                last_id = message_id
+                
+                # Mensagens anteriores que só existem fora de ordem
+                while index < len(pending) and pending[index] < message_id:
+                    out.write(renderer.message(overrides[pending[index]]))
+                    index += 1
+                if index < len(pending) and pending[index] == message_id:
+                    index += 1
+                out.write(renderer.message(overrides.get(message_id, entry)))
+            
+            for message_id in pending[index:]:
+                out.write(renderer.message(overrides[message_id]))
+            out.write(renderer.footer())
         
+        self._discard(channel.id)
+    
+    async def finalize(self, channel: discord.TextChannel, fmt: Optional[str] = None) -> str:
+        """Completar o log e renderizar a transcrição final"""
+        if not await self._run(self.has_log, channel.id):
+            return await TranscriptGenerator.generate(channel, fmt)
+        
+        # Só há o que buscar se a captura teve lacuna desde a marca
+        if channel.id not in self.live_channels:
+            await self.catch_up(channel)
+        
+        renderer = TranscriptGenerator._renderer(fmt)
+        filepath = TranscriptGenerator._output_path(channel, renderer)
+        await self._run(self._render, channel, renderer, filepath)
         return filepath
+    
+    def _discard(self, channel_id):
+        self.synced_ids.pop(channel_id, None)
+        self.live_channels.discard(channel_id)
+        if self.has_log(channel_id):
+            os.remove(self._path(channel_id))
+    
+    async def discard(self, channel_id):
+        """Descartar o log de um ticket"""
+        await self._run(self._discard, channel_id)
+    
+    def _prune(self, keep):
+        removed = 0
+        for filename in os.listdir(self.base_dir):
+            channel_id, ext = os.path.splitext(filename)
+            if ext == '.jsonl' and channel_id not in keep:
+                self._discard(int(channel_id) if channel_id.isdigit() else channel_id)
+                removed += 1
+        return removed
+    
+    async def prune(self, open_channel_ids) -> int:
+        """Remover logs de canais que não são mais tickets abertos"""
+        return await self._run(self._prune, {str(channel_id) for channel_id in open_channel_ids})
 
 class Formatters:
     """Formatadores de texto"""
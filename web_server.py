@@ -1,9 +1,11 @@
-from quart import Quart, request, jsonify, render_template, redirect, send_file
-import aiohttp
+from quart import Quart, Response, request, jsonify, render_template, redirect, send_file
 import os
+import math
+import time
 import logging
 from datetime import datetime, timedelta
 from utils import Config
+from metrics import registry, STRIPE_WEBHOOK_LATENCY
 import discord
 import stripe
 
@@ -25,6 +27,7 @@ class WebServer:
         self.oauth_scopes = os.getenv('OAUTH_SCOPES', 'identify guilds.join').split()
         self.api_endpoint = 'https://discord.com/api/v10'
         self.web_password = os.getenv('WEB_PASSWORD', 'admin123')
+        self.metrics_token = os.getenv('METRICS_TOKEN')
     
     def setup_routes(self):
         """Configurar rotas do servidor"""
@@ -70,10 +73,11 @@ class WebServer:
                 
                 # Salvar no banco (FORÇAR COMMIT)
                 expires_at = int((datetime.utcnow() + timedelta(seconds=expires_in)).timestamp())
-                self.bot.db.add_oauth_user(user_id, access_token, refresh_token, expires_at)
+                await self.bot.db.add_oauth_user(user_id, access_token, refresh_token, expires_at)
+                self.bot.token_refresher.schedule(user_id, expires_at)
                 
                 # Verificar se salvou
-                saved_user = self.bot.db.get_oauth_user(user_id)
+                saved_user = await self.bot.db.get_oauth_user(user_id)
                 if saved_user:
                     logger.info(f"✅ {username} ({user_id}) autorizou OAuth2 e foi salvo no banco")
                 else:
@@ -84,7 +88,7 @@ class WebServer:
                 guild = self.bot.get_guild(int(guild_id))
                 
                 if guild:
-                    config = self.bot.db.get_config(guild_id)
+                    config = await self.bot.db.get_config(guild_id)
                     
                     # Verificar se usuário já está no servidor
                     member = guild.get_member(int(user_id))
@@ -115,7 +119,7 @@ class WebServer:
                 
                 # Notificar em logs
                 if guild:
-                    config = self.bot.db.get_config(guild_id)
+                    config = await self.bot.db.get_config(guild_id)
                     log_channel_id = int(config.get('log_channel', Config.LOG_CHANNEL_ID)) if config else Config.LOG_CHANNEL_ID
                     log_channel = self.bot.get_channel(log_channel_id)
                     if log_channel:
@@ -151,8 +155,8 @@ class WebServer:
             if auth != self.web_password:
                 return await render_template('login.html')
             
-            stats = self.bot.db.get_stats()
-            backups = self.bot.db.get_all_backups()
+            stats = await self.bot.db.get_stats()
+            backups = await self.bot.db.get_all_backups()
             
             return await render_template('dashboard.html',
                                         stats=stats,
@@ -180,7 +184,7 @@ class WebServer:
             if auth != self.web_password:
                 return jsonify({'error': 'Não autorizado'}), 401
             
-            stats = self.bot.db.get_stats()
+            stats = await self.bot.db.get_stats()
             return jsonify(stats)
         
         @self.app.route('/api/backup/create', methods=['POST'])
@@ -191,7 +195,7 @@ class WebServer:
                 return jsonify({'error': 'Não autorizado'}), 401
             
             try:
-                backup_path = self.bot.db.backup()
+                backup_path = await self.bot.db.backup()
                 if backup_path:
                     return jsonify({'success': True, 'backup': backup_path})
                 else:
@@ -235,7 +239,7 @@ class WebServer:
                 return jsonify({'error': 'Não autorizado'}), 401
             
             try:
-                json_path = self.bot.db.export_json()
+                json_path = await self.bot.db.export_json()
                 if json_path:
                     return jsonify({'success': True, 'file': json_path})
                 else:
@@ -246,45 +250,107 @@ class WebServer:
         
         @self.app.route('/health')
         async def health():
-            """Health check para Railway"""
+            """Liveness para Railway: apenas confirma que o processo responde"""
+            return jsonify({'status': 'online'})
+        
+        @self.app.route('/health/ready')
+        async def health_ready():
+            """Prontidão a partir de valores já em memória, sem consultar o banco"""
+            ready = self.bot.is_ready() and not self.bot.is_closed()
+            latency = self.bot.latency
+            
+            return jsonify({
+                'status': 'ready' if ready else 'starting',
+                'gateway': {
+                    'latency_ms': round(latency * 1000, 1) if math.isfinite(latency) else None,
+                    'startup_runs': self.bot.startup_runs,
+                    'reconnects': self.bot.reconnect_runs,
+                    'resumes': self.bot.resume_count
+                },
+                'database': {
+                    'write_queue': self.bot.db.write_queue_depth,
+                    'pending_writes': self.bot.db.pending_writes,
+                    'last_backup_at': self.bot.db.last_backup_at
+                },
+                'startup': {
+                    'ready_after': self.bot.ready_after,
+                    'timeline': self.bot.startup_timeline
+                }
+            }), 200 if ready else 503
+        
+        @self.app.route('/health/deep')
+        async def health_deep():
+            """Verificação completa (banco, estatísticas), sob demanda"""
+            auth = request.headers.get('Authorization') or request.cookies.get('auth')
+            if auth != self.web_password:
+                return jsonify({'error': 'Não autorizado'}), 401
+            
+            checks = {}
+            try:
+                checks['integrity'] = await self.bot.db.integrity_check()
+                stats = await self.bot.db.get_stats(fresh=True)
+                checks['oauth_users'] = stats['total_users']
+                checks['tickets'] = stats['total_tickets']
+                checks['blacklisted'] = stats['total_blacklisted']
+            except Exception as e:
+                logger.error(f"Erro no health check completo: {e}")
+                checks['error'] = str(e)
+            
+            healthy = checks.get('integrity') == 'ok'
             return jsonify({
-                'status': 'online',
+                'status': 'healthy' if healthy else 'unhealthy',
                 'guilds': len(self.bot.guilds),
                 'users': len(self.bot.users),
-                'oauth_users': self.bot.db.get_stats()['total_users']
-            })
+                'scheduled_tokens': self.bot.token_refresher.pending,
+                'checks': checks
+            }), 200 if healthy else 503
+        
+        @self.app.route('/metrics')
+        async def metrics():
+            """Métricas no formato texto do Prometheus"""
+            if self.metrics_token and request.headers.get('Authorization') != f'Bearer {self.metrics_token}':
+                return jsonify({'error': 'Não autorizado'}), 401
+            
+            return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
         
         # ===================== ROTAS DO STRIPE =====================
         @self.app.route('/webhook/stripe', methods=['POST'])
         async def stripe_webhook():
             """Webhook do Stripe"""
-            payload = await request.get_data()
-            sig_header = request.headers.get('Stripe-Signature')
-            
+            started = time.perf_counter()
+            # Sem evento válido (payload/assinatura/config) o tempo vai para 'invalid'
+            event_type = 'invalid'
             try:
-                payments_cog = self.bot.get_cog('Payments')
-                if not payments_cog or not payments_cog.webhook_secret:
-                    logger.error("Webhook secret não configurado")
-                    return jsonify({'error': 'Configuration error'}), 500
+                payload = await request.get_data()
+                sig_header = request.headers.get('Stripe-Signature')
                 
-                event = stripe.Webhook.construct_event(
-                    payload, sig_header, payments_cog.webhook_secret
-                )
-            except ValueError:
-                logger.error("Payload inválido do Stripe")
-                return jsonify({'error': 'Invalid payload'}), 400
-            except stripe.error.SignatureVerificationError:
-                logger.error("Assinatura inválida do Stripe")
-                return jsonify({'error': 'Invalid signature'}), 400
-            
-            if event['type'] == 'checkout.session.completed':
-                session = event['data']['object']
-                payments_cog = self.bot.get_cog('Payments')
-                if payments_cog:
-                    await payments_cog.handle_successful_payment(session)
-                    logger.info(f"✅ Pagamento processado: {session['id']}")
-            
-            return jsonify({'success': True})
+                try:
+                    payments_cog = self.bot.get_cog('Payments')
+                    if not payments_cog or not payments_cog.webhook_secret:
+                        logger.error("Webhook secret não configurado")
+                        return jsonify({'error': 'Configuration error'}), 500
+                    
+                    event = stripe.Webhook.construct_event(
+                        payload, sig_header, payments_cog.webhook_secret
+                    )
+                    event_type = event['type']
+                except ValueError:
+                    logger.error("Payload inválido do Stripe")
+                    return jsonify({'error': 'Invalid payload'}), 400
+                except stripe.error.SignatureVerificationError:
+                    logger.error("Assinatura inválida do Stripe")
+                    return jsonify({'error': 'Invalid signature'}), 400
+                
+                if event['type'] == 'checkout.session.completed':
+                    session = event['data']['object']
+                    payments_cog = self.bot.get_cog('Payments')
+                    if payments_cog:
+                        await payments_cog.handle_successful_payment(session)
+                        logger.info(f"✅ Pagamento processado: {session['id']}")
+                
+                return jsonify({'success': True})
+            finally:
+                STRIPE_WEBHOOK_LATENCY.observe(time.perf_counter() - started, event_type=event_type)
 
         @self.app.route('/payment/success')
         async def payment_success():
@@ -309,28 +375,26 @@ class WebServer:
         
         headers = {'Content-Type': 'application/x-www-form-urlencoded'}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f'{self.api_endpoint}/oauth2/token',
-                data=data,
-                headers=headers
-            ) as resp:
-                if resp.status == 200:
-                    return await resp.json()
-                return None
+        async with self.bot.http_session.post(
+            f'{self.api_endpoint}/oauth2/token',
+            data=data,
+            headers=headers
+        ) as resp:
+            if resp.status == 200:
+                return await resp.json()
+            return None
     
     async def get_user_info(self, access_token):
         """Obter informações do usuário"""
         headers = {'Authorization': f'Bearer {access_token}'}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f'{self.api_endpoint}/users/@me',
-                headers=headers
-            ) as resp:
-                if resp.status == 200:
-                    return await resp.json()
-                return None
+        async with self.bot.http_session.get(
+            f'{self.api_endpoint}/users/@me',
+            headers=headers
+        ) as resp:
+            if resp.status == 200:
+                return await resp.json()
+            return None
     
     async def add_user_to_guild(self, user_id, guild_id, access_token):
         """Adicionar usuário ao servidor"""
@@ -341,13 +405,12 @@ class WebServer:
         
         data = {'access_token': access_token}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.put(
-                f'{self.api_endpoint}/guilds/{guild_id}/members/{user_id}',
-                headers=headers,
-                json=data
-            ) as resp:
-                return resp.status in [200, 201, 204]
+        async with self.bot.http_session.put(
+            f'{self.api_endpoint}/guilds/{guild_id}/members/{user_id}',
+            headers=headers,
+            json=data
+        ) as resp:
+            return resp.status in [200, 201, 204]
     
     async def start(self):
         """Iniciar servidor web"""